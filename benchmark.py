@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import burger_core as core
+
+# -----------------------------------------------------------
+# CONFIG
+# -----------------------------------------------------------
+
+BENCH_MENU_SIZES = [(4, 8), (6, 20), (8, 50)]  # Generated menus as (categories, ingredients per category)
+BENCH_SIMULATIONS = 50000  # Burgers simulated per engine for the throughput numbers
+BENCH_ITERATIONS = 200  # Top 3 settings used for the timed runs
+BENCH_SIMS_PER_EVAL = 5000
+BENCH_REFINE_STEPS = 10
+BENCH_MAX_ING_PER_CAT = 5
+BENCH_REFERENCE_FACTOR = 10  # The reference optimum gets this many times the iterations of a timed run
+BENCH_TOLERANCE = 0.1  # Relative change that counts as a regression when comparing with a baseline
+
+HIGHER_IS_BETTER = ("burgers_per_sec", "exact_evals_per_sec", "quality", "quality_per_sec", "efficiency")
+LOWER_IS_BETTER = ("wall_time",)
+
+
+def generate_menu(n_cats, per_cat, seed=0):
+    rng = random.Random(seed)
+    categories = {}
+    for c in range(n_cats):
+        categories[f"cat{c}"] = [
+            {
+                "name": f"cat{c}_ing{i}",
+                "price": float(rng.randint(1, 10)),
+                "finish_chance": float(rng.choice((10, 20, 30))),
+                "unique_bonus": float(rng.randint(0, 3)),
+                "enabled": True,
+            }
+            for i in range(per_cat)
+        ]
+    return {
+        "bottom_bun": {"price": 3.0, "unique_bonus": 1.0},
+        "top_bun": {"price": 3.0, "unique_bonus": 1.0},
+        "categories": categories,
+    }
+
+
+def bench_menus(sizes):
+    here = os.path.dirname(os.path.abspath(__file__))
+    menus = [("test_menu", core.load_menu_file(os.path.join(here, "test_menu.json")))]
+    for n_cats, per_cat in sizes:
+        menus.append((f"generated_{n_cats}x{per_cat}", generate_menu(n_cats, per_cat)))
+    return menus
+
+
+def exact_income(menu, categories_dict):
+    # Scores a found menu without Monte Carlo noise where possible (the exact engine falls back otherwise)
+    test_menu = {"bottom_bun": menu["bottom_bun"], "top_bun": menu["top_bun"], "categories": categories_dict}
+    return core.simulate_menu(test_menu, simulations=BENCH_SIMULATIONS * 4, engine="exact")
+
+
+def top3_run(menu, iterations, workers, engine, refine_steps=None):
+    start = time.perf_counter()
+    top3 = core.compute_top3_menus(menu, iterations=iterations, sims_per_eval=BENCH_SIMS_PER_EVAL,
+                                   max_ing_per_cat=BENCH_MAX_ING_PER_CAT,
+                                   refine_steps=BENCH_REFINE_STEPS if refine_steps is None else refine_steps,
+                                   workers=workers, engine=engine)
+    return time.perf_counter() - start, top3
+
+
+def reference_income(menu, workers):
+    saved = core.TOP3_REFINE_NEIGHBOURS
+    core.TOP3_REFINE_NEIGHBOURS = None
+    try:
+        _, top3 = top3_run(menu, BENCH_ITERATIONS * BENCH_REFERENCE_FACTOR, workers, "exact", refine_steps=200)
+    finally:
+        core.TOP3_REFINE_NEIGHBOURS = saved
+    return exact_income(menu, top3[0][1])
+
+
+def bench_menu(name, menu, args):
+    compiled = core.CompiledMenu(menu)
+    record = {"name": name, "slots": len(compiled.items), "burgers_per_sec": {}}
+
+    for engine in ("python", "numpy"):
+        if engine == "numpy" and core.load_numpy() is None:
+            continue
+        start = time.perf_counter()
+        core.simulate_config_stats(compiled, None, BENCH_SIMULATIONS, engine)
+        record["burgers_per_sec"][engine] = BENCH_SIMULATIONS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    try:
+        core.expected_income_compiled(compiled)
+        record["exact_evals_per_sec"] = 1.0 / (time.perf_counter() - start)
+    except core.ExactStateLimitExceeded:
+        record["exact_evals_per_sec"] = None
+
+    random.seed(args.seed)
+    wall_time, top3 = top3_run(menu, BENCH_ITERATIONS, args.workers, args.engine)
+    found = exact_income(menu, top3[0][1])
+    reference = max(reference_income(menu, args.workers), found)
+    quality = found / reference if reference else 1.0
+    record["top3"] = {
+        "engine": args.engine or core.TOP3_ENGINE,
+        "wall_time": wall_time,
+        "income": found,
+        "reference": reference,
+        "quality": quality,
+        "quality_per_sec": quality / wall_time,
+    }
+    return record
+
+
+def bench_scaling(menu, max_workers, engine):
+    counts = sorted({1 << i for i in range(max_workers.bit_length()) if 1 << i <= max_workers} | {max_workers})
+    results = []
+    base = None
+    for workers in counts:
+        random.seed(0)
+        wall_time, _ = top3_run(menu, BENCH_ITERATIONS, workers, engine)
+        if base is None:
+            base = wall_time
+        results.append({
+            "workers": workers,
+            "wall_time": wall_time,
+            "speedup": base / wall_time,
+            "efficiency": base / (wall_time * workers),
+        })
+    return results
+
+
+def flatten(record, prefix=""):
+    flat = {}
+    if isinstance(record, dict):
+        for key, value in record.items():
+            flat.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(record, list):
+        for item in record:
+            key = item.get("name") or f"workers={item.get('workers')}"
+            flat.update(flatten(item, f"{prefix}{key}."))
+    elif isinstance(record, (int, float)) and not isinstance(record, bool):
+        flat[prefix[:-1]] = record
+    return flat
+
+
+def find_regressions(baseline, current, tolerance):
+    old = flatten({"menus": baseline.get("menus", []), "scaling": baseline.get("scaling", [])})
+    new = flatten({"menus": current.get("menus", []), "scaling": current.get("scaling", [])})
+    regressions = []
+    for key, value in new.items():
+        before = old.get(key)
+        if before is None or not before:
+            continue
+        metric = key.rsplit(".", 1)[-1]
+        parent = key.rsplit(".", 2)[-2]
+        if metric in HIGHER_IS_BETTER or parent in HIGHER_IS_BETTER:
+            if value < before * (1 - tolerance):
+                regressions.append({"metric": key, "baseline": before, "current": value})
+        elif metric in LOWER_IS_BETTER and value > before * (1 + tolerance):
+            regressions.append({"metric": key, "baseline": before, "current": value})
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput and quality benchmarks for the burger optimizer.")
+    parser.add_argument("--workers", type=int, default=None, help="workers for the Top 3 runs (default: all cores)")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count(), help="largest worker count to scale to")
+    parser.add_argument("--engine", choices=sorted(core.SIMULATION_ENGINES), default=None,
+                        help="engine for the Top 3 runs")
+    parser.add_argument("--scaling-engine", choices=sorted(core.SIMULATION_ENGINES), default="python",
+                        help="engine for the worker scaling runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="only test_menu.json and the smallest generated menu")
+    parser.add_argument("--output", default="-", help="JSON result file (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    sizes = BENCH_MENU_SIZES[:1] if args.quick else BENCH_MENU_SIZES
+    menus = bench_menus(sizes)
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": core.load_numpy().__version__ if core.load_numpy() is not None else None,
+        "menus": [bench_menu(name, menu, args) for name, menu in menus],
+        "scaling": bench_scaling(menus[0][1], max(1, args.max_workers or 1), args.scaling_engine),
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        result["regressions"] = find_regressions(baseline, result, args.tolerance)
+        for regression in result["regressions"]:
+            print(f"REGRESSION {regression['metric']}: {regression['baseline']:.4g} -> {regression['current']:.4g}",
+                  file=sys.stderr)
+        status = 1 if result["regressions"] else 0
+
+    text = json.dumps(result, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,2663 @@
+import random
+import math
+import bisect
+import heapq
+import itertools
+import json
+import hashlib
+from array import array
+import multiprocessing
+import queue
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.connection import Client, Listener
+import os
+import sys
+import time
+import threading
+
+np = None  # NumPy is optional and slow to import, so load_numpy() imports it the first time an engine needs it
+_NUMPY_LOADED = False
+
+# -----------------------------------------------------------
+# CONFIG
+# -----------------------------------------------------------
+
+# This is my default configuration. In general, the larger the value, the more accurate the result.
+# Underestimating TOP3_ITERATIONS will reduce the chances of rare and unpopular menu solutions being selected.
+# Underestimating TOP3_SIMS_PER_EVAL will lead to greater price deviation and greater chaos in the results.
+# At least till lategame TOP3_MAX_ING_PER_CAT = 10 is upper cap so feel free to set around 5-7
+
+TOP3_K = 3  # How many best menus a run keeps and reports
+TOP3_ITERATIONS = 1000  # How many random menus to try (other strategies get the same number of full evaluations)
+TOP3_SIMS_PER_EVAL = 20000  # How many simulations to use per menu evaluation
+TOP3_MAX_ING_PER_CAT = 10  # Max ingredients per category in the menu
+TOP3_REFINE_STEPS = 50  # Max steepest-ascent steps for each top candidate (stops earlier at a local optimum)
+TOP3_REFINE_NEIGHBOURS = 64  # Max neighbour menus scored per candidate and refine step (None = whole neighbourhood)
+CPU_AMOUNT = None  # Number of processes for parallel calculation (None = os.cpu_count())
+DISTRIBUTED_WORKERS = None  # Remote evaluation workers as "host:port" or "host:first-last" (None = local processes)
+DISTRIBUTED_AUTHKEY = None  # Shared secret of the remote workers (None = the BURGER_AUTHKEY environment variable)
+DISTRIBUTED_RETRIES = 3  # Reconnect attempts before a remote worker that went away is left out of a run
+DISTRIBUTED_RETRY_DELAY = 1.0  # Seconds between reconnect attempts
+TOP3_RACING = False  # Race Monte Carlo candidates in stages and drop the hopeless ones early (uses random search)
+RACING_FIRST_BATCH = 500  # Simulations per candidate in the first racing stage
+RACING_GROWTH = 2  # Each racing stage multiplies the batch size by this factor
+TOP3_STRATEGY = "genetic"  # Search strategy: "genetic", "annealing", "random" or "branch_and_bound" (proven optimum)
+TOP3_BUDGET_SIMS = None  # Simulation budget of the search (None = TOP3_ITERATIONS * TOP3_SIMS_PER_EVAL)
+TOP3_BUDGET_SECONDS = None  # Wall-clock budget of the search in seconds (None = no time limit)
+TOP3_REFINE_SHARE = 0.2  # Share of an explicit budget kept for refinement (the default budget only covers the search)
+ANNEAL_CHAINS = 8  # Parallel annealing chains
+ANNEAL_START_TEMP = 0.5  # Annealing temperature at the start and end of the budget, in income units
+ANNEAL_END_TEMP = 0.02
+GA_POPULATION = 40  # Genetic search population size
+GA_ELITE = 4  # Best menus copied unchanged into the next generation
+GA_MUTATION = 0.3  # Chance that a child gets one extra random move
+GA_TOURNAMENT = 3  # Tournament size for parent selection
+BNB_TIME_LIMIT = 600  # Seconds before branch and bound stops with the best found and a gap estimate (None = no limit)
+BNB_SUBTREES = 64  # Branch and bound runs as at least this many subtree jobs; cancelling waits for the running ones
+BNB_SEED_EVALUATIONS = 300  # Genetic search evaluations that seed branch and bound with good menus
+WARM_START_BUDGET = 0.2  # Share of the search budget a re-run after small menu edits gets
+WARM_START_MAX_CHANGED = 0.3  # Re-runs start from scratch once more than this share of the ingredients changed
+WARM_START_TEMP = 0.1  # Starting annealing temperature around the previous best menus
+TOP3_SEED = None  # Master seed of a search and its Monte Carlo streams (None = drawn from the global random module)
+TOP3_COMMON_RANDOM_NUMBERS = True  # Score all menus of a search on the same random draws (less noisy comparisons)
+CI_Z = 2.576  # z-score for confidence intervals (2.576 = 99%)
+TOP3_ENGINE = "exact"  # Evaluation engine: "exact" (Markov chain DP), "python" (scalar loop) or "numpy" (needs numpy)
+NUMPY_BATCH_SIZE = 8192  # How many burgers the numpy engine stacks at once
+EXACT_MAX_STATES = 20000  # Above this many DP states the exact engine falls back to Monte Carlo
+EXACT_FALLBACK_ENGINE = None  # Monte Carlo engine used by the exact fallback (None = numpy if installed, else python)
+TOP3_PROGRESS_BATCH = 100  # Menus evaluated between two progress reports (and cancellation checks)
+TOP3_CACHE_SIZE = 100000  # Max menu evaluations kept in the evaluation cache (least recently used are dropped)
+TOP3_CACHE_DIR = None  # Directory to persist evaluation caches (None = keep them in memory only)
+INTRA_MENU_MIN_SIMS = 20000  # With fewer menus than workers, a menu's burgers are split in slices of at least this
+PRECISE_MAX_SIMS = 10000000  # Most burgers a high-precision single menu evaluation simulates
+TOP3_FINAL_PRECISION = None  # Re-evaluate the final Top 3 until the income CI half-width is at most this (None = off)
+SWEEP_FACTORS = (0.9, 1.1)  # What-if sweeps multiply each parameter by these factors, one at a time
+SWEEP_FIELDS = ("price", "unique_bonus", "finish_chance")  # Ingredient fields the sweep perturbs
+TOP3_CPROFILE = None  # File to dump cProfile stats of each Top 3 run to (None = no cProfile)
+TOP3_CHECKPOINT_SECONDS = 30  # Seconds between checkpoints of a running Top 3 search (None = only when cancelled)
+
+ING_SCORE_FINISH_WEIGHT = 10  # Penalty weight for finish_chance in top-ingredient heuristic
+
+CHECKPOINT_SUFFIX = ".top3-checkpoint.json"  # Checkpoints are written next to the menu file with this suffix
+DEFAULT_CHECKPOINT_FILE = "top3_checkpoint.json"  # Checkpoint of a menu that was never saved
+
+
+def load_numpy():
+    # The numpy module, or None if it is not installed
+    global np, _NUMPY_LOADED
+    if not _NUMPY_LOADED:
+        _NUMPY_LOADED = True
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np
+
+
+def stats_mean(stats):
+    n, total, _ = stats
+    return total / n if n else 0.0
+
+
+def stats_ci(stats, z=None):
+    # Half-width of the confidence interval of the mean
+    if z is None:
+        z = CI_Z
+    n, total, total_sq = stats
+    if n < 2:
+        return float("inf") if n == 0 else 0.0
+    mean = total / n
+    var = max(total_sq / n - mean * mean, 0.0) * n / (n - 1)
+    return z * (var / n) ** 0.5
+
+
+def merge_stats(a, b):
+    return a[0] + b[0], a[1] + b[1], a[2] + b[2]
+
+
+class CompiledMenu:
+    # Flat, array-backed view of a menu dict for the simulation hot path. Every ingredient of every category
+    # is a slot with an integer ID; slots sharing a name share a name ID, so "seen" checks use int bitmasks.
+    # A candidate menu is a sorted tuple of slot IDs (None = every enabled slot).
+    __slots__ = ("fingerprint", "buns", "categories", "ranges", "items", "slot_category", "slot_name",
+                 "price", "bonus", "finish", "enabled", "n_names")
+
+    def __init__(self, menu):
+        self.fingerprint = hashlib.sha1(json.dumps(menu, sort_keys=True).encode("utf-8")).hexdigest()
+        self.buns = float(menu["bottom_bun"]["price"] + menu["bottom_bun"]["unique_bonus"]
+                          + menu["top_bun"]["price"] + menu["top_bun"]["unique_bonus"])
+        self.categories = list(menu["categories"].keys())
+        self.ranges = []
+        self.items = []
+        self.slot_category = array("i")
+        self.slot_name = array("i")
+        self.price = array("d")
+        self.bonus = array("d")
+        self.finish = array("d")
+        self.enabled = array("b")
+
+        name_ids = {}
+        for ci, items in enumerate(menu["categories"].values()):
+            start = len(self.items)
+            for ing in items:
+                self.items.append(ing)
+                self.slot_category.append(ci)
+                self.slot_name.append(name_ids.setdefault(ing["name"], len(name_ids)))
+                self.price.append(ing["price"])
+                self.bonus.append(ing["unique_bonus"])
+                self.finish.append(ing["finish_chance"])
+                self.enabled.append(bool(ing.get("enabled", True)))
+            self.ranges.append((start, len(self.items)))
+        self.n_names = len(name_ids)
+
+    def enabled_slots(self, ci):
+        start, end = self.ranges[ci]
+        return [i for i in range(start, end) if self.enabled[i]]
+
+    def category_slots(self, config=None):
+        # Enabled slots of the config grouped by category; categories left without any are dropped, which
+        # matches the scalar loop redrawing such categories.
+        if config is None:
+            groups = [self.enabled_slots(ci) for ci in range(len(self.categories))]
+        else:
+            groups = [[] for _ in self.categories]
+            for i in config:
+                if self.enabled[i]:
+                    groups[self.slot_category[i]].append(i)
+        return [slots for slots in groups if slots]
+
+    def encode(self, categories_cfg):
+        slot_of = {id(ing): i for i, ing in enumerate(self.items)}
+        return tuple(sorted(slot_of[id(ing)] for ings in categories_cfg.values() for ing in ings))
+
+    def decode(self, config):
+        categories_cfg = {cat: [] for cat in self.categories}
+        for i in sorted(config):
+            categories_cfg[self.categories[self.slot_category[i]]].append(self.items[i])
+        return categories_cfg
+
+    def encode_names(self, categories_names):
+        # Slot IDs of a menu given as {category: [ingredient names]}; unknown and disabled ingredients are skipped
+        slot_of = {(self.categories[self.slot_category[i]], self.items[i]["name"]): i
+                   for i in range(len(self.items)) if self.enabled[i]}
+        return tuple(sorted(slot_of[(cat, name)] for cat, names in categories_names.items()
+                            for name in names if (cat, name) in slot_of))
+
+    def with_values(self, changes):
+        # Copy with some slot values replaced; changes are (slot, field, value) with the ingredient field names
+        variant = object.__new__(CompiledMenu)
+        for name in CompiledMenu.__slots__:
+            setattr(variant, name, getattr(self, name))
+        variant.fingerprint = None
+        for attr in ("price", "bonus", "finish"):
+            setattr(variant, attr, array("d", getattr(self, attr)))
+        for slot, field, value in changes:
+            getattr(variant, _SLOT_FIELDS[field])[slot] = value
+        return variant
+
+
+_SLOT_FIELDS = {"price": "price", "unique_bonus": "bonus", "finish_chance": "finish"}
+
+
+# Burgers and burger steps simulated by this process, read around pool jobs by RunProfile
+_SIMULATION_COUNTERS = [0, 0]
+
+
+def _count_burgers(burgers, steps):
+    _SIMULATION_COUNTERS[0] += burgers
+    _SIMULATION_COUNTERS[1] += steps
+
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN64 = 0x9E3779B97F4A7C15
+_LCG_MUL = 6364136223846793005
+_LCG_INC = 1442695040888963407
+_U53 = 2.0 ** -53
+
+
+def _splitmix64(x):
+    x = (x + _GOLDEN64) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def stream_seed(seed, *path):
+    # 64-bit key of an independent random stream, derived from a master seed and a path of integers
+    key = _splitmix64(seed & _MASK64)
+    for part in path:
+        key = _splitmix64(key ^ (part & _MASK64))
+    return key
+
+
+# Seeded Monte Carlo runs give burger j of a stream its own generator: a 64-bit LCG started from
+# splitmix64(key + j * golden). Every step of a burger takes exactly two draws, one for the category and (from
+# the fraction left over) the ingredient, one for the finish roll, so two menus simulated on the same key see
+# the same draws burger by burger and step by step, and a run continuing at `offset` burgers picks up exactly
+# where an earlier one stopped. The python and numpy engines consume the streams identically.
+
+def _simulate_compiled_streams(cats, start, simulations, seed, offset):
+    n_cats = len(cats)
+    total_money = 0.0
+    total_sq = 0.0
+    steps = 0
+
+    for j in range(offset, offset + simulations):
+        state = (seed + (j + 1) * _GOLDEN64) & _MASK64
+        state = ((state ^ (state >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        state = ((state ^ (state >> 27)) * 0x94D049BB133111EB) & _MASK64
+        state ^= state >> 31
+        used_categories = 0
+        seen_ingredients = 0
+        money = start
+
+        while True:
+            steps += 1
+            state = (state * _LCG_MUL + _LCG_INC) & _MASK64
+            pick = (state >> 11) * _U53 * n_cats
+            ci = int(pick)
+            items = cats[ci]
+            price, bonus, finish, bit = items[int((pick - ci) * len(items))]
+            state = (state * _LCG_MUL + _LCG_INC) & _MASK64
+            roll = (state >> 11) * _U53
+
+            cat_bit = 1 << ci
+            if not used_categories & cat_bit:
+                used_categories |= cat_bit
+                if seen_ingredients & bit:
+                    money += price
+                else:
+                    seen_ingredients |= bit
+                    money += price + bonus
+                continue
+
+            if seen_ingredients & bit:
+                if roll < 0.5:
+                    break
+                money += price
+                continue
+
+            seen_ingredients |= bit
+            money += price + bonus
+            if roll < finish:
+                break
+
+        total_money += money
+        total_sq += money * money
+
+    _count_burgers(simulations, steps)
+    return simulations, total_money, total_sq
+
+
+def simulate_compiled_stats(compiled, config=None, simulations=None, seed=None, offset=0):
+    # Without a seed the draws come from the global random module; see above for seeded runs
+    if simulations is None:
+        simulations = TOP3_SIMS_PER_EVAL
+    start = compiled.buns
+    cats = [[(compiled.price[i], compiled.bonus[i], compiled.finish[i], 1 << compiled.slot_name[i]) for i in slots]
+            for slots in compiled.category_slots(config)]
+    if not cats:
+        return simulations, start * simulations, start * start * simulations
+    if seed is not None:
+        return _simulate_compiled_streams(cats, start, simulations, seed, offset)
+
+    n_cats = len(cats)
+    rnd = random.random
+    total_money = 0.0
+    total_sq = 0.0
+    steps = 0
+
+    for _ in range(simulations):
+        used_categories = 0
+        seen_ingredients = 0
+        money = start
+
+        while True:
+            steps += 1
+            ci = int(rnd() * n_cats)
+            items = cats[ci]
+            price, bonus, finish, bit = items[int(rnd() * len(items))]
+
+            cat_bit = 1 << ci
+            if not used_categories & cat_bit:
+                used_categories |= cat_bit
+                if seen_ingredients & bit:
+                    money += price
+                else:
+                    seen_ingredients |= bit
+                    money += price + bonus
+                continue
+
+            if seen_ingredients & bit:
+                if rnd() < 0.5:
+                    break
+                money += price
+                continue
+
+            seen_ingredients |= bit
+            money += price + bonus
+            if rnd() < finish:
+                break
+
+        total_money += money
+        total_sq += money * money
+
+    _count_burgers(simulations, steps)
+    return simulations, total_money, total_sq
+
+
+def simulate_burger_stats(menu, simulations=None):
+    return simulate_compiled_stats(CompiledMenu(menu), None, simulations)
+
+
+def simulate_burger(menu, simulations=None):
+    return stats_mean(simulate_burger_stats(menu, simulations))
+
+
+def _numpy_splitmix64(x):
+    x = x + np.uint64(_GOLDEN64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _numpy_draw(state):
+    state *= np.uint64(_LCG_MUL)
+    state += np.uint64(_LCG_INC)
+    return (state >> np.uint64(11)) * _U53
+
+
+def simulate_compiled_numpy_stats(compiled, config=None, simulations=None, batch_size=None, seed=None, offset=0):
+    if load_numpy() is None:
+        raise RuntimeError("The numpy engine requires numpy to be installed")
+    if simulations is None:
+        simulations = TOP3_SIMS_PER_EVAL
+    if batch_size is None:
+        batch_size = NUMPY_BATCH_SIZE
+
+    start = compiled.buns
+    groups = compiled.category_slots(config)
+    if not groups:
+        return simulations, start * simulations, start * start * simulations
+
+    slots = np.array([i for group in groups for i in group], dtype=np.intp)
+    counts = np.array([len(group) for group in groups], dtype=np.intp)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    slot_price = np.frombuffer(compiled.price, dtype=float)[slots]
+    slot_bonus = np.frombuffer(compiled.bonus, dtype=float)[slots]
+    slot_finish = np.frombuffer(compiled.finish, dtype=float)[slots]
+    # Renumber names to the ones present so the seen matrix stays narrow
+    used_names, slot_name = np.unique(np.frombuffer(compiled.slot_name, dtype=np.int32)[slots], return_inverse=True)
+    n_cats = len(counts)
+    n_names = len(used_names)
+
+    rng = np.random.default_rng() if seed is None else None
+    total_money = 0.0
+    total_sq = 0.0
+    steps = 0
+    done = 0
+    while done < simulations:
+        n = min(batch_size, simulations - done)
+        money = np.full(n, start)
+        used = np.zeros((n, n_cats), dtype=bool)
+        seen = np.zeros((n, n_names), dtype=bool)
+        alive = np.arange(n)
+        if seed is not None:
+            state = _numpy_splitmix64(np.uint64(seed) + np.arange(offset + done, offset + done + n, dtype=np.uint64)
+                                      * np.uint64(_GOLDEN64))
+
+        while alive.size:
+            m = alive.size
+            steps += m
+            if seed is None:
+                cat = rng.integers(0, n_cats, m)
+                slot = offsets[cat] + (rng.random(m) * counts[cat]).astype(np.intp)
+                roll = rng.random(m)
+            else:
+                live = state[alive]
+                pick = _numpy_draw(live) * n_cats
+                cat = pick.astype(np.intp)
+                slot = offsets[cat] + ((pick - cat) * counts[cat]).astype(np.intp)
+                roll = _numpy_draw(live)
+                state[alive] = live
+            name = slot_name[slot]
+
+            first_in_cat = ~used[alive, cat]
+            was_seen = seen[alive, name]
+            finish = ~first_in_cat & np.where(was_seen, roll < 0.5, roll < slot_finish[slot])
+            gain = slot_price[slot] + np.where(was_seen, 0.0, slot_bonus[slot])
+            gain[finish & was_seen] = 0.0
+
+            money[alive] += gain
+            used[alive, cat] = True
+            seen[alive, name] = True
+            alive = alive[~finish]
+
+        total_money += money.sum()
+        total_sq += np.dot(money, money)
+        done += n
+
+    _count_burgers(simulations, steps)
+    return simulations, float(total_money), float(total_sq)
+
+
+def simulate_burger_numpy_stats(menu, simulations=None, batch_size=None):
+    return simulate_compiled_numpy_stats(CompiledMenu(menu), None, simulations, batch_size)
+
+
+def simulate_burger_numpy(menu, simulations=None, batch_size=None):
+    return stats_mean(simulate_burger_numpy_stats(menu, simulations, batch_size))
+
+
+class ExactStateLimitExceeded(Exception):
+    pass
+
+
+def _chain_value(groups, optimistic=(), max_states=None):
+    # Expected money the ingredients add to one burger. `groups` are the categories on the menu, each a list of
+    # (name ID, price, bonus, finish) entries. `optimistic` categories are undecided ones for branch and bound:
+    # each is (first draw gain, best price, [(gain, finish), ...] for unseen draws, max ingredients) and every
+    # draw from it takes whichever option is worth most, which bounds any real choice of ingredients from above.
+    if max_states is None:
+        max_states = EXACT_MAX_STATES
+    n_menu = len(groups)
+    n_cats = n_menu + len(optimistic)
+    if not n_cats:
+        return 0.0
+
+    # Ingredients with the same name share the "seen" flag. Names whose (price, bonus, finish) entries are
+    # identical in every category are interchangeable, so the state only tracks how many of each class were seen.
+    profiles = {}
+    for ci, entries in enumerate(groups):
+        for name, price, bonus, finish in entries:
+            prof = profiles.setdefault(name, [[] for _ in range(n_menu)])
+            prof[ci].append((price, bonus, min(max(finish, 0.0), 1.0)))
+    class_sizes = {}
+    for prof in profiles.values():
+        key = tuple(tuple(sorted(entries)) for entries in prof)
+        class_sizes[key] = class_sizes.get(key, 0) + 1
+
+    # State = used category bitmask in the low bits, per-class seen counts packed in mixed radix above it,
+    # followed by the number of ingredients seen in each optimistic category.
+    strides = []
+    stride = 1 << n_cats
+    for size in class_sizes.values():
+        strides.append(stride)
+        stride *= size + 1
+    opt_specs = []
+    for u, (first_gain, seen_price, unseen, cap) in enumerate(optimistic):
+        unseen = [(gain, min(max(finish, 0.0), 1.0)) for gain, finish in unseen]
+        opt_specs.append((1 << (n_menu + u), stride, cap, first_gain, seen_price, unseen))
+        stride *= cap + 1
+    opt_weight = 1.0 / n_cats
+
+    # Cheap upper bound on the states before expanding any, so hopeless chains fall back straight away. A
+    # category's used bit only adds states when it shares a name class with another category (otherwise it is
+    # set exactly when one of its classes was seen), and an optimistic category is used exactly when its count
+    # is non-zero. A class of one category whose finish chances are all 1 is only ever seen by that category's
+    # first draw (any later unseen draw there finishes the burger), so at most one such class per category is.
+    estimate = 1
+    hard = [0] * n_menu
+    for key, size in class_sizes.items():
+        cats = [ci for ci, entries in enumerate(key) if entries]
+        if len(cats) == 1 and all(finish >= 1.0 for _, _, finish in key[cats[0]]):
+            hard[cats[0]] += 1
+        else:
+            estimate *= size + 1
+    for n in hard:
+        estimate *= n + 1
+    for _, _, _, cap in optimistic:
+        estimate *= cap + 1
+    shared = sum(1 for ci in range(n_menu)
+                 if any(key[ci] and sum(1 for entries in key if entries) > 1 for key in class_sizes))
+    if estimate << shared > max_states:
+        raise ExactStateLimitExceeded(f"more than {max_states} states")
+
+    moves = [[] for _ in range(n_menu)]
+    for k, (key, size) in enumerate(class_sizes.items()):
+        for ci, entries in enumerate(key):
+            weight = 1.0 / (n_cats * len(groups[ci]))
+            for price, bonus, finish in entries:
+                moves[ci].append((k, size, weight, price, bonus, finish))
+
+    def expand(state):
+        gain = 0.0
+        stay = 0.0
+        nexts = {}
+        for ci in range(n_menu):
+            bit = 1 << ci
+            cat_used = state & bit
+            for k, size, weight, price, bonus, finish in moves[ci]:
+                seen = (state // strides[k]) % (size + 1)
+                if seen:
+                    p = weight * seen
+                    if cat_used:
+                        # 50% the burger is finished, otherwise the price is added and nothing changes
+                        gain += p * 0.5 * price
+                        stay += p * 0.5
+                    else:
+                        gain += p * price
+                        nxt = state | bit
+                        nexts[nxt] = nexts.get(nxt, 0.0) + p
+                if seen < size:
+                    p = weight * (size - seen)
+                    gain += p * (price + bonus)
+                    nxt = (state | bit) + strides[k]
+                    if cat_used:
+                        p *= 1.0 - finish
+                        if not p:
+                            continue
+                    nexts[nxt] = nexts.get(nxt, 0.0) + p
+
+        opt = []
+        for bit, opt_stride, cap, _, _, _ in opt_specs:
+            if not state & bit:
+                opt.append((True, 0, (state | bit) + opt_stride))
+            else:
+                seen = (state // opt_stride) % (cap + 1)
+                opt.append((False, seen, state + opt_stride if seen < cap else None))
+        return gain, stay, nexts, opt
+
+    def children(info):
+        yield from info[2]
+        for _, _, nxt in info[3]:
+            if nxt is not None:
+                yield nxt
+
+    def solve(info):
+        gain, stay, nexts, opt = info
+        total = gain
+        for nxt, p in nexts.items():
+            total += p * values[nxt]
+        choices = []
+        for (first, seen, nxt), (_, _, _, first_gain, seen_price, unseen) in zip(opt, opt_specs):
+            if first:
+                total += opt_weight * (first_gain + values[nxt])
+                continue
+            best_unseen = None
+            if nxt is not None:
+                best_unseen = max(g + (1.0 - f) * values[nxt] for g, f in unseen)
+            if not seen:
+                total += opt_weight * best_unseen
+            else:
+                choices.append((best_unseen, 0.5 * seen_price))
+        # Redrawing a seen ingredient loops back to this state, so which option is best depends on the value
+        # itself. Policy iteration: solve for the current choices, switch where the other option is better.
+        loops = [best_unseen is None for best_unseen, _ in choices]
+        while True:
+            numerator = total
+            slope = stay
+            for loop, (best_unseen, half_price) in zip(loops, choices):
+                if loop:
+                    numerator += opt_weight * half_price
+                    slope += opt_weight * 0.5
+                else:
+                    numerator += opt_weight * best_unseen
+            value = numerator / (1.0 - slope)
+            new_loops = [best_unseen is None or half_price + 0.5 * value > best_unseen + 1e-12
+                         for best_unseen, half_price in choices]
+            if new_loops == loops:
+                break
+            loops = new_loops
+        return value
+
+    values = {}
+    pending = {}
+    stack = [0]
+    while stack:
+        state = stack[-1]
+        if state in values:
+            stack.pop()
+            continue
+        info = pending.get(state)
+        if info is None:
+            if len(values) + len(pending) >= max_states:
+                raise ExactStateLimitExceeded(f"more than {max_states} states")
+            info = expand(state)
+            pending[state] = info
+            missing = [nxt for nxt in children(info) if nxt not in values]
+            if missing:
+                stack.extend(missing)
+                continue
+        values[state] = solve(info)
+        del pending[state]
+        stack.pop()
+
+    return values[0]
+
+
+def expected_income_compiled(compiled, config=None, max_states=None):
+    groups = [[(compiled.slot_name[i], compiled.price[i], compiled.bonus[i], compiled.finish[i]) for i in slots]
+              for slots in compiled.category_slots(config)]
+    return compiled.buns + _chain_value(groups, (), max_states)
+
+
+def _optimistic_category(compiled, ci, max_ing_per_cat):
+    slots = compiled.enabled_slots(ci)
+    options = sorted({(compiled.price[i] + compiled.bonus[i], min(max(compiled.finish[i], 0.0), 1.0))
+                      for i in slots}, key=lambda x: (-x[0], x[1]))
+    # Only options that are not beaten on both gain and finish chance can ever be the best one
+    unseen = []
+    for gain, finish in options:
+        if not unseen or finish < unseen[-1][1]:
+            unseen.append((gain, finish))
+    return (unseen[0][0], max(compiled.price[i] for i in slots), unseen,
+            min(max_ing_per_cat, len(slots)))
+
+
+def _names_unique_per_category(compiled):
+    owner = {}
+    for i, name in enumerate(compiled.slot_name):
+        if compiled.enabled[i] and owner.setdefault(name, compiled.slot_category[i]) != compiled.slot_category[i]:
+            return False
+    return True
+
+
+def menu_upper_bound(compiled, chosen, free_cats, max_ing_per_cat, max_states=None):
+    # Upper bound on the income of every menu that keeps the `chosen` slots and picks up to max_ing_per_cat
+    # ingredients (possibly none) in each of the `free_cats` categories.
+    groups = [[(compiled.slot_name[i], compiled.price[i], compiled.bonus[i], compiled.finish[i]) for i in slots]
+              for slots in chosen if slots]
+    specs = [_optimistic_category(compiled, ci, max_ing_per_cat) for ci in free_cats if compiled.enabled_slots(ci)]
+    best = 0.0
+    # The number of categories on the menu changes every draw probability, so try every set of free
+    # categories that could end up non-empty.
+    for mask in range(1 << len(specs)):
+        optimistic = [spec for j, spec in enumerate(specs) if mask >> j & 1]
+        try:
+            best = max(best, _chain_value(groups, optimistic, max_states))
+        except ExactStateLimitExceeded:
+            return float("inf")
+    return compiled.buns + best
+
+
+def _category_subsets(compiled, ci, max_ing_per_cat):
+    slots = compiled.enabled_slots(ci)
+    subsets = []
+    for k in range(min(max_ing_per_cat, len(slots)) + 1):
+        subsets.extend(itertools.combinations(slots, k))
+    return subsets
+
+
+def branch_and_bound_job(compiled, payload):
+    # Depth-first branch and bound over the categories in `order`, below the fixed `prefix` subsets whose
+    # upper bound is `root_bound`; children are never bounded above their parent. Returns
+    # the best (income, config, exact) leaves found, the highest bound left unexplored when the deadline hit
+    # (None if the subtree was finished) and the number of nodes visited.
+    order, prefix, root_bound, threshold, k, max_ing_per_cat, deadline = payload
+    subsets = {ci: _category_subsets(compiled, ci, max_ing_per_cat) for ci in order[len(prefix):]}
+    top = []
+    state = {"open_bound": None, "nodes": 0}
+
+    def cutoff():
+        return max(threshold, top[0][0]) if len(top) >= k else threshold
+
+    def leaf(chosen):
+        config = tuple(sorted(i for subset in chosen for i in subset))
+        try:
+            value, exact = expected_income_compiled(compiled, config), True
+        except ExactStateLimitExceeded:
+            value, exact = stats_mean(simulate_config_stats(compiled, config, TOP3_SIMS_PER_EVAL, "numpy"
+                                                             if load_numpy() is not None else "python")), False
+        entry = (value, config, exact)
+        if len(top) < k:
+            heapq.heappush(top, entry)
+        elif value > top[0][0]:
+            heapq.heapreplace(top, entry)
+
+    def give_up(bound):
+        if state["open_bound"] is None or bound > state["open_bound"]:
+            state["open_bound"] = bound
+
+    def visit(chosen, depth, node_bound):
+        state["nodes"] += 1
+        if depth == len(order):
+            leaf(chosen)
+            return
+        free = order[depth + 1:]
+        children = []
+        for subset in subsets[order[depth]]:
+            if free:
+                bound = min(node_bound, menu_upper_bound(compiled, chosen + [subset], free, max_ing_per_cat))
+            else:
+                bound = node_bound
+            children.append((bound, subset))
+        children.sort(key=lambda x: -x[0])
+        for bound, subset in children:
+            if bound <= cutoff() + 1e-9:
+                break
+            if deadline is not None and time.time() > deadline:
+                give_up(bound)
+                return
+            visit(chosen + [subset], depth + 1, bound)
+
+    if root_bound > cutoff() + 1e-9:
+        visit(list(prefix), len(prefix), root_bound)
+    return sorted(top, reverse=True), state["open_bound"], state["nodes"]
+
+
+def expected_income_exact(menu, max_states=None):
+    return expected_income_compiled(CompiledMenu(menu), None, max_states)
+
+
+def simulate_compiled_exact_stats(compiled, config=None, simulations=None, seed=None, offset=0):
+    if simulations is None:
+        simulations = TOP3_SIMS_PER_EVAL
+    try:
+        income = expected_income_compiled(compiled, config)
+    except ExactStateLimitExceeded:
+        fallback = EXACT_FALLBACK_ENGINE
+        if fallback is None:
+            fallback = "numpy" if load_numpy() is not None else "python"
+        return simulate_config_stats(compiled, config, simulations, fallback, seed, offset)
+    # An exact value carries no sampling noise, so it is reported as a zero-variance sample
+    return simulations, income * simulations, income * income * simulations
+
+
+def simulate_burger_exact_stats(menu, simulations=None):
+    return simulate_compiled_exact_stats(CompiledMenu(menu), None, simulations)
+
+
+def simulate_burger_exact(menu, simulations=None):
+    return stats_mean(simulate_burger_exact_stats(menu, simulations))
+
+
+SIMULATION_ENGINES = {
+    "exact": simulate_compiled_exact_stats,
+    "python": simulate_compiled_stats,
+    "numpy": simulate_compiled_numpy_stats,
+}
+
+
+def simulate_config_stats(compiled, config=None, simulations=None, engine=None, seed=None, offset=0):
+    if engine is None:
+        engine = TOP3_ENGINE
+    try:
+        simulate = SIMULATION_ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"Unknown simulation engine: {engine!r}")
+    if seed is None:
+        return simulate(compiled, config, simulations)
+    return simulate(compiled, config, simulations, seed=seed, offset=offset)
+
+
+def simulate_menu_stats(menu, simulations=None, engine=None):
+    return simulate_config_stats(CompiledMenu(menu), None, simulations, engine)
+
+
+def simulate_menu(menu, simulations=None, engine=None):
+    return stats_mean(simulate_menu_stats(menu, simulations, engine))
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+_WORKER_MENUS = OrderedDict()
+WORKER_MENU_SLOTS = 4  # Compiled menus each pool worker keeps around
+
+
+def _remember_worker_menu(compiled):
+    _WORKER_MENUS[compiled.fingerprint] = compiled
+    _WORKER_MENUS.move_to_end(compiled.fingerprint)
+    while len(_WORKER_MENUS) > WORKER_MENU_SLOTS:
+        _WORKER_MENUS.popitem(last=False)
+
+
+def _init_worker(compiled):
+    # Forked workers inherit the parent's random state; unseeded simulations must not repeat each other's draws
+    random.seed()
+    _remember_worker_menu(compiled)
+
+
+def _timed_job(fn, compiled, payload):
+    # Returns fn's result and (pid, busy seconds, burgers, burger steps) for RunProfile
+    burgers, steps = _SIMULATION_COUNTERS
+    start = time.perf_counter()
+    result = fn(compiled, payload)
+    return result, (os.getpid(), time.perf_counter() - start, _SIMULATION_COUNTERS[0] - burgers,
+                    _SIMULATION_COUNTERS[1] - steps)
+
+
+def _pool_task(args):
+    # Runs in a pool worker: jobs refer to a menu the worker already holds by its fingerprint. The menu is only
+    # attached when the parent has not broadcast it yet; None asks the parent to resend it.
+    fn, fingerprint, compiled, payload = args
+    if compiled is not None:
+        _remember_worker_menu(compiled)
+    compiled = _WORKER_MENUS.get(fingerprint)
+    if compiled is None:
+        return None
+    return _timed_job(fn, compiled, payload)
+
+
+def eval_chunk_job(compiled, payload):
+    chunk, sims, engine, seeds, offset = payload
+    if seeds is None:
+        seeds = [None] * len(chunk)
+    return [simulate_config_stats(compiled, config, sims, engine, seed, offset) for config, seed in zip(chunk, seeds)]
+
+
+class EvaluationPool:
+    # Long-lived process pool shared by every menu it evaluates. Each compiled menu is sent to the workers once
+    # (through the initializer for the first one, attached to the first jobs for later ones); jobs otherwise
+    # only carry slot ID tuples.
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = CPU_AMOUNT if CPU_AMOUNT is not None else os.cpu_count()
+        self.workers = workers or 1
+        self.executor = None
+        self.broadcast = set()
+
+    def _ensure_executor(self, compiled):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                initargs=(compiled,))
+            self.broadcast = {compiled.fingerprint}
+
+    def run(self, compiled, fn, payloads, cancel=None, on_result=None, profile=None):
+        # Runs fn(compiled, payload) for every payload on the workers and returns the results in order;
+        # on_result(index, result) is called as they are collected. Time and job statistics go to `profile`.
+        if profile is None:
+            profile = RunProfile()
+        results = []
+        if self.workers <= 1:
+            with profile.phase("evaluation"):
+                for index, payload in enumerate(payloads):
+                    if cancel is not None and cancel.is_set():
+                        raise SearchCancelled()
+                    result, job = _timed_job(fn, compiled, payload)
+                    profile.add_job(*job)
+                    results.append(result)
+                    if on_result is not None:
+                        on_result(index, result)
+            return results
+
+        try:
+            return self._run_executor(compiled, fn, payloads, cancel, on_result, profile)
+        except BrokenProcessPool:
+            # A worker died; the executor cannot be used again, so the next run starts a new one
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.broadcast = set()
+            raise
+
+    def _run_executor(self, compiled, fn, payloads, cancel, on_result, profile):
+        results = []
+        # A new executor starts its worker processes while the first jobs are submitted
+        with profile.phase("pool startup" if self.executor is None else "dispatch"):
+            self._ensure_executor(compiled)
+            fingerprint = compiled.fingerprint
+            attach = None if fingerprint in self.broadcast else compiled
+            self.broadcast.add(fingerprint)
+            futures = [self.executor.submit(_pool_task, (fn, fingerprint, attach, payload)) for payload in payloads]
+
+        with profile.phase("evaluation"):
+            for index, (payload, future) in enumerate(zip(payloads, futures)):
+                while cancel is not None and not future.done():
+                    if cancel.wait(0.05):
+                        # Jobs already running finish on their own; everything still queued is dropped
+                        for f in futures:
+                            f.cancel()
+                        raise SearchCancelled()
+                done = future.result()
+                if done is None:
+                    done = self.executor.submit(_pool_task, (fn, fingerprint, compiled, payload)).result()
+                result, job = done
+                profile.add_job(*job)
+                results.append(result)
+                if on_result is not None:
+                    on_result(index, result)
+        return results
+
+    def evaluate(self, compiled, configs, sims, engine=None, cancel=None, seeds=None, offset=0, profile=None):
+        # `seeds` gives each config its random stream (see stream_seed), starting `offset` burgers in.
+        # In-process runs go one config at a time so cancellation stays responsive.
+        if (self.workers > 1 and (engine or TOP3_ENGINE) != "exact" and sims >= 2 * INTRA_MENU_MIN_SIMS
+                and len(configs) < self.workers * 4):
+            return self._evaluate_sliced(compiled, configs, sims, engine, cancel, seeds, offset, profile)
+        chunk_size = 1 if self.workers <= 1 else max(1, -(-len(configs) // (self.workers * 4)))
+        payloads = [(configs[i:i + chunk_size], sims, engine, seeds[i:i + chunk_size] if seeds else None, offset)
+                    for i in range(0, len(configs), chunk_size)]
+        return [stats for chunk in self.run(compiled, eval_chunk_job, payloads, cancel, profile=profile)
+                for stats in chunk]
+
+    def _evaluate_sliced(self, compiled, configs, sims, engine, cancel, seeds, offset, profile):
+        # Too few menus to keep the workers busy: split each menu's simulations into slices that continue
+        # one another's random stream and merge the sums. Seeded results equal a single sequential run.
+        slices = min(sims // INTRA_MENU_MIN_SIMS, -(-self.workers * 4 // len(configs)))
+        bounds = [sims * k // slices for k in range(slices + 1)]
+        payloads, owners = [], []
+        for index, config in enumerate(configs):
+            for start, end in zip(bounds, bounds[1:]):
+                payloads.append(([config], end - start, engine, [seeds[index]] if seeds else None, offset + start))
+                owners.append(index)
+        merged = [(0, 0.0, 0.0)] * len(configs)
+        for index, (stats,) in zip(owners, self.run(compiled, eval_chunk_job, payloads, cancel, profile=profile)):
+            merged[index] = merge_stats(merged[index], stats)
+        return merged
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+            self.broadcast = set()
+
+
+def parse_worker_addresses(spec):
+    # Addresses from "host:port" or "host:first-last" (one worker per port) items, comma-separated or a list
+    if isinstance(spec, str):
+        spec = spec.split(",")
+    addresses = []
+    for item in spec:
+        host, _, ports = item.strip().rpartition(":")
+        first, _, last = ports.partition("-")
+        addresses.extend((host or "localhost", port) for port in range(int(first), int(last or first) + 1))
+    return addresses
+
+
+def _worker_authkey(authkey=None):
+    # Messages are pickles and unpickling runs code, so workers and drivers never talk without a shared secret
+    if authkey is None:
+        authkey = DISTRIBUTED_AUTHKEY or os.environ.get("BURGER_AUTHKEY")
+    if not authkey:
+        raise ValueError("Remote workers need an authkey (DISTRIBUTED_AUTHKEY or BURGER_AUTHKEY)")
+    if isinstance(authkey, str):
+        authkey = authkey.encode("utf-8")
+    return authkey
+
+
+def serve_worker(address, authkey=None):
+    # Remote evaluation worker for DistributedPool: serves one driver connection at a time, forever, to
+    # drivers that know the authkey
+    authkey = _worker_authkey(authkey)
+    random.seed()
+    with Listener(address, authkey=authkey) as listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, multiprocessing.AuthenticationError):
+                continue
+            with conn:
+                try:
+                    while True:
+                        message = conn.recv()
+                        if message[0] == "menu":
+                            _remember_worker_menu(message[1])
+                            continue
+                        _, fn, fingerprint, payload = message
+                        compiled = _WORKER_MENUS.get(fingerprint)
+                        if compiled is None:
+                            conn.send(("missing",))
+                            continue
+                        try:
+                            reply = ("result", *_timed_job(fn, compiled, payload))
+                        except Exception as e:
+                            reply = ("error", e)
+                        conn.send(reply)
+                except (EOFError, OSError):
+                    pass
+
+
+def serve_workers(spec, authkey=None):
+    # One serve_worker process per address, e.g. "0.0.0.0:7000-7007" for eight workers on this machine
+    addresses = parse_worker_addresses(spec)
+    authkey = _worker_authkey(authkey)
+    if len(addresses) == 1:
+        serve_worker(addresses[0], authkey)
+        return
+    processes = [multiprocessing.Process(target=serve_worker, args=(address, authkey), daemon=True)
+                 for address in addresses]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+class DistributedPool(EvaluationPool):
+    # EvaluationPool backend that runs jobs on remote worker processes (see serve_worker) instead of a local
+    # process pool. Every connection gets each compiled menu once. Jobs are dealt out round-robin to one queue
+    # per worker, a worker whose queue is empty steals from the back of the longest one, and results reach
+    # on_result as they arrive. A worker that goes away is reconnected up to DISTRIBUTED_RETRIES times and its
+    # job goes back to the queues; the run only fails once no worker is left.
+    def __init__(self, addresses=None, authkey=None):
+        if addresses is None:
+            addresses = DISTRIBUTED_WORKERS
+        self.addresses = parse_worker_addresses(addresses)
+        if not self.addresses:
+            raise ValueError("DistributedPool needs at least one worker address")
+        super().__init__(len(self.addresses))
+        self.authkey = _worker_authkey(authkey)
+        self.connections = [None] * len(self.addresses)
+        self.sent = [set() for _ in self.addresses]
+
+    def _connect(self, i):
+        for attempt in range(DISTRIBUTED_RETRIES + 1):
+            if attempt:
+                time.sleep(DISTRIBUTED_RETRY_DELAY)
+            try:
+                self.connections[i] = Client(self.addresses[i], authkey=self.authkey)
+                self.sent[i] = set()
+                return True
+            except OSError:
+                pass
+        return False
+
+    def _disconnect(self, i):
+        conn, self.connections[i] = self.connections[i], None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, i, compiled, fn, payload):
+        conn = self.connections[i]
+        fingerprint = compiled.fingerprint
+        while True:
+            if fingerprint not in self.sent[i]:
+                conn.send(("menu", compiled))
+                self.sent[i].add(fingerprint)
+            conn.send(("job", fn, fingerprint, payload))
+            reply = conn.recv()
+            if reply[0] == "missing":
+                # The worker dropped the menu to make room for others (see WORKER_MENU_SLOTS)
+                self.sent[i].discard(fingerprint)
+                continue
+            if reply[0] == "error":
+                raise reply[1]
+            return reply[1], reply[2]
+
+    def run(self, compiled, fn, payloads, cancel=None, on_result=None, profile=None):
+        if profile is None:
+            profile = RunProfile()
+        queues = [deque(range(i, len(payloads), self.workers)) for i in range(self.workers)]
+        state = threading.Condition()
+        in_flight = [0]
+        stop = threading.Event()
+        arrivals = queue.Queue()
+
+        def take(i):
+            # Waits while other workers still run jobs that may come back to the queues
+            with state:
+                while not stop.is_set():
+                    victim = queues[i] if queues[i] else max(queues, key=len)
+                    if victim:
+                        in_flight[0] += 1
+                        return victim.popleft() if victim is queues[i] else victim.pop()
+                    if not in_flight[0]:
+                        return None
+                    state.wait()
+                return None
+
+        def finish(i, index=None):
+            with state:
+                in_flight[0] -= 1
+                if index is not None:
+                    queues[i].appendleft(index)
+                state.notify_all()
+
+        def work(i):
+            try:
+                if self.connections[i] is None and not self._connect(i):
+                    return
+                host, port = self.addresses[i]
+                while True:
+                    index = take(i)
+                    if index is None:
+                        return
+                    try:
+                        result, (_, busy, burgers, steps) = self._call(i, compiled, fn, payloads[index])
+                    except (OSError, EOFError):
+                        self._disconnect(i)
+                        finish(i, index)
+                        if not self._connect(i):
+                            return
+                        continue
+                    finish(i)
+                    arrivals.put((index, result, (f"{host}:{port}", busy, burgers, steps)))
+            except Exception as e:
+                self._disconnect(i)
+                arrivals.put((None, e, None))
+
+        threads = [threading.Thread(target=work, args=(i,), daemon=True) for i in range(self.workers)]
+        results = [None] * len(payloads)
+        with profile.phase("dispatch"):
+            for thread in threads:
+                thread.start()
+        try:
+            with profile.phase("evaluation"):
+                for _ in payloads:
+                    while True:
+                        if cancel is not None and cancel.is_set():
+                            raise SearchCancelled()
+                        try:
+                            index, result, job = arrivals.get(timeout=0.05)
+                            break
+                        except queue.Empty:
+                            if not any(thread.is_alive() for thread in threads) and arrivals.empty():
+                                raise ConnectionError("No remote evaluation worker is reachable")
+                    if index is None:
+                        raise result
+                    profile.add_job(*job)
+                    results[index] = result
+                    if on_result is not None:
+                        on_result(index, result)
+        finally:
+            # Jobs already running finish on their own, so the connections are idle for the next run
+            with state:
+                stop.set()
+                state.notify_all()
+            for thread in threads:
+                thread.join()
+        return results
+
+    def shutdown(self):
+        for i in range(self.workers):
+            self._disconnect(i)
+
+
+def make_pool(workers=None, remote=None):
+    # The evaluation backend: remote workers when given or configured (see DistributedPool), else local processes.
+    # workers=1 always evaluates in this process.
+    if remote is None:
+        remote = DISTRIBUTED_WORKERS
+    if remote and workers != 1:
+        return DistributedPool(remote)
+    return EvaluationPool(workers)
+
+
+def slot_content(compiled, i):
+    return compiled.items[i]["name"], compiled.price[i], compiled.bonus[i], compiled.finish[i]
+
+
+def canonical_config(compiled, config):
+    # A menu's income only depends on the buns and on the ingredients it uses, so the canonical form lists
+    # their contents per category instead of slot IDs: it stays valid when other ingredients are edited,
+    # added or removed. Disabled slots never reach the simulation and are left out.
+    groups = {}
+    for i in config:
+        if compiled.enabled[i]:
+            groups.setdefault(compiled.categories[compiled.slot_category[i]], []).append(slot_content(compiled, i))
+    return tuple(sorted((cat, tuple(sorted(items))) for cat, items in groups.items()))
+
+
+class EvaluationCache:
+    # LRU cache of evaluation statistics keyed by (engine, canonical config) for one set of buns. Asking for
+    # more simulations than a cached entry has only simulates the missing ones and merges them into the entry.
+    def __init__(self, max_entries=None, directory=None):
+        if max_entries is None:
+            max_entries = TOP3_CACHE_SIZE
+        self.max_entries = max_entries
+        self.directory = directory
+        self.buns = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def bind(self, compiled):
+        # Every income includes the buns, so entries only carry over between menus with the same buns
+        if compiled.buns == self.buns:
+            return
+        self.save()
+        self.entries.clear()
+        self.buns = compiled.buns
+        self.load()
+
+    def evaluate(self, compiled, configs, sims, engine, evaluate):
+        # Returns stats with at least `sims` simulations for every config; `evaluate(configs, sims, offset)` is
+        # called once per distinct number of missing simulations, `offset` being how many are cached already.
+        self.bind(compiled)
+        keys = [(engine, canonical_config(compiled, config)) for config in configs]
+        results = {}
+        missing = {}
+        for key, config in zip(keys, configs):
+            if key in results or key in missing:
+                continue
+            stats = self.entries.get(key)
+            if stats is not None and stats[0] >= sims:
+                self.entries.move_to_end(key)
+                results[key] = stats
+                self.hits += 1
+            else:
+                missing[key] = (config, sims - stats[0] if stats is not None else sims)
+                self.misses += 1
+
+        by_sims = {}
+        for key, (config, need) in missing.items():
+            by_sims.setdefault(need, []).append((key, config))
+        for need, group in by_sims.items():
+            for (key, _), stats in zip(group, evaluate([config for _, config in group], need, sims - need)):
+                old = self.entries.get(key)
+                results[key] = merge_stats(old, stats) if old is not None else stats
+
+        for key in missing:
+            self.entries[key] = results[key]
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return [results[key] for key in keys]
+
+    def put(self, compiled, engine, config, stats):
+        # Adds known stats of a config, keeping whichever of them and a cached entry has more simulations
+        self.bind(compiled)
+        key = (engine, canonical_config(compiled, config))
+        old = self.entries.get(key)
+        if old is None or old[0] < stats[0]:
+            self.entries[key] = stats
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _path(self):
+        return os.path.join(self.directory, f"buns_{self.buns!r}.json")
+
+    def load(self):
+        if not self.directory:
+            return
+        try:
+            with open(self._path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for engine, groups, n, total, total_sq in data.get("entries", []):
+            key = tuple((cat, tuple(tuple(item) for item in items)) for cat, items in groups)
+            self.entries[(engine, key)] = (n, total, total_sq)
+
+    def save(self):
+        if not self.directory or self.buns is None:
+            return
+        entries = [[engine, key, *stats] for (engine, key), stats in self.entries.items()]
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(), "w", encoding="utf-8") as f:
+                json.dump({"buns": self.buns, "entries": entries}, f)
+        except OSError:
+            pass
+
+
+def evaluate_menu_stats(menu, config=None, precision=None, max_simulations=None, engine=None, pool=None,
+                        workers=None, seed=None, stats=None, cancel=None, progress=None, profile=None):
+    # High-accuracy evaluation of one menu (a menu dict, or a CompiledMenu and a config) spread over the pool.
+    # Simulates in waves until the confidence interval half-width is at most `precision` or max_simulations
+    # burgers are done; `stats` continues an earlier evaluation of the same stream. progress(stats) is called
+    # after every wave. The exact engine needs no simulations unless its state limit sends it to Monte Carlo.
+    if max_simulations is None:
+        max_simulations = PRECISE_MAX_SIMS
+    if engine is None:
+        engine = TOP3_ENGINE
+    compiled = menu if isinstance(menu, CompiledMenu) else CompiledMenu(menu)
+    if config is None:
+        config = tuple(i for ci in range(len(compiled.categories)) for i in compiled.enabled_slots(ci))
+    if engine == "exact":
+        try:
+            income = expected_income_compiled(compiled, config)
+            n = TOP3_SIMS_PER_EVAL
+            return n, income * n, income * income * n
+        except ExactStateLimitExceeded:
+            engine = EXACT_FALLBACK_ENGINE or ("numpy" if load_numpy() is not None else "python")
+    if seed is None:
+        seed = random.getrandbits(64)
+    if stats is None:
+        stats = (0, 0.0, 0.0)
+
+    own_pool = pool is None
+    if own_pool:
+        pool = make_pool(workers)
+    try:
+        wave = pool.workers * INTRA_MENU_MIN_SIMS
+        while stats[0] < max_simulations:
+            if cancel is not None and cancel.is_set():
+                raise SearchCancelled()
+            n = wave
+            if precision is not None and stats[0] >= 2:
+                ci = stats_ci(stats)
+                if ci <= precision:
+                    break
+                # The half-width shrinks with the square root of the number of burgers
+                needed = stats[0] * (ci / precision) ** 2 - stats[0]
+                n = max(wave, int(needed * 1.1))
+            n = min(n, max_simulations - stats[0])
+            stats = merge_stats(stats, pool.evaluate(compiled, [config], n, engine, cancel, [seed], stats[0],
+                                                     profile)[0])
+            if progress is not None:
+                progress(stats)
+    finally:
+        if own_pool:
+            pool.shutdown()
+    return stats
+
+
+class RunProfile:
+    # Where the time of a Top 3 run goes. Phases are timed exclusively: a phase entered inside another one
+    # pauses the outer one, so the phase times add up to the instrumented part of the run. Pool jobs report
+    # their worker, busy time and how many burgers (and burger steps) they simulated. With `cprofile` set to
+    # a path, the parent process is also run under cProfile and the stats are dumped there.
+    def __init__(self, cprofile=None):
+        self.phases = OrderedDict()
+        self.stack = []
+        self.workers = {}
+        self.jobs = 0
+        self.burgers = 0
+        self.steps = 0
+        self.counters = {}
+        self.cprofile = cprofile
+        self.profiler = None
+        self.start_time = None
+        self.wall_time = 0.0
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        if self.cprofile:
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop(self):
+        if self.start_time is not None:
+            self.wall_time += time.perf_counter() - self.start_time
+            self.start_time = None
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.cprofile)
+            self.profiler = None
+
+    @contextmanager
+    def phase(self, name):
+        now = time.perf_counter()
+        if self.stack:
+            outer, since = self.stack[-1]
+            self.phases[outer] = self.phases.get(outer, 0.0) + now - since
+        self.stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, since = self.stack.pop()
+            self.phases[name] = self.phases.get(name, 0.0) + now - since
+            if self.stack:
+                self.stack[-1][1] = now
+
+    def add_job(self, pid, busy, burgers, steps):
+        self.jobs += 1
+        self.workers[pid] = self.workers.get(pid, 0.0) + busy
+        self.burgers += burgers
+        self.steps += steps
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self):
+        pool_time = sum(self.phases.get(name, 0.0) for name in ("pool startup", "dispatch", "evaluation"))
+        evaluation = self.phases.get("evaluation", 0.0)
+        return {
+            "wall_time": self.wall_time,
+            "phases": dict(self.phases),
+            "other": max(self.wall_time - sum(self.phases.values()), 0.0),
+            "jobs": self.jobs,
+            "burgers": self.burgers,
+            "burgers_per_sec": self.burgers / evaluation if evaluation else None,
+            "avg_burger_length": self.steps / self.burgers if self.burgers else None,
+            "counters": dict(self.counters),
+            # Share of the time the pool was in use that each worker spent running jobs
+            "workers": {str(pid): {"busy": busy, "utilisation": busy / pool_time if pool_time else None}
+                        for pid, busy in sorted(self.workers.items())},
+        }
+
+    def summary(self):
+        report = self.report()
+        lines = [f"Profile ({report['wall_time']:.2f} s):"]
+        for name, seconds in report["phases"].items():
+            share = 100.0 * seconds / report["wall_time"] if report["wall_time"] else 0.0
+            lines.append(f"  {name.capitalize()}: {seconds:.2f} s ({share:.0f}%)")
+        lines.append(f"  Other: {report['other']:.2f} s")
+        counters = ", ".join(f"{value} {name}" for name, value in report["counters"].items())
+        if counters:
+            lines.append(f"  {counters}")
+        if report["burgers"]:
+            lines.append(f"  {report['burgers']} burgers simulated ({report['burgers_per_sec'] or 0:.0f}/s), "
+                         f"{report['avg_burger_length']:.2f} steps per burger")
+        if report["workers"]:
+            usage = ", ".join(f"{100.0 * (w['utilisation'] or 0.0):.0f}%" for w in report["workers"].values())
+            lines.append(f"  {len(report['workers'])} workers, utilisation {usage}")
+        return "\n".join(lines)
+
+
+class Leaderboard:
+    # The best `k` menus seen so far, de-duplicated by canonical config. A min-heap on the mean income with
+    # lazy deletion keeps it bounded, so a menu that does not make the cut costs one comparison. Entries keep
+    # (n, sum, sum_sq) stats; offer() replaces an entry's stats by ones with more simulations (the same menu
+    # evaluated further). Iterating yields (stats, config) pairs, best first.
+    def __init__(self, compiled, k=None):
+        if k is None:
+            k = TOP3_K
+        if k < 1:
+            raise ValueError(f"A leaderboard keeps at least 1 menu, not {k}")
+        self.compiled = compiled
+        self.k = k
+        self.entries = {}
+        self.slots = {}
+        self.heap = []
+        self.stamps = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.ranked())
+
+    def ranked(self):
+        entries = sorted(self.entries.values(), key=lambda e: stats_mean(e[0]), reverse=True)
+        return [(stats, config) for stats, config, _ in entries]
+
+    def floor(self):
+        # Lowest mean on a full board, None while there is room
+        if len(self.entries) < self.k:
+            return None
+        while True:
+            mean, stamp, key = self.heap[0]
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] == stamp:
+                return mean
+            heapq.heappop(self.heap)
+
+    def _key(self, config):
+        key = self.slots.get(config)
+        return key if key is not None else canonical_config(self.compiled, config)
+
+    def _put(self, key, stats, config):
+        old = self.entries.get(key)
+        if old is not None:
+            del self.slots[old[1]]
+        stamp = next(self.stamps)
+        self.entries[key] = (stats, config, stamp)
+        self.slots[config] = key
+        heapq.heappush(self.heap, (stats_mean(stats), stamp, key))
+        while len(self.entries) > self.k:
+            _, stamp, worst = heapq.heappop(self.heap)
+            entry = self.entries.get(worst)
+            if entry is not None and entry[2] == stamp:
+                del self.entries[worst]
+                del self.slots[entry[1]]
+        # Replaced entries leave stale heap items behind
+        if len(self.heap) > 4 * self.k + 64:
+            self.heap = [(stats_mean(s), stamp, key) for key, (s, _, stamp) in self.entries.items()]
+            heapq.heapify(self.heap)
+
+    def offer(self, stats, config):
+        if config not in self.slots:
+            floor = self.floor()
+            if floor is not None and stats_mean(stats) <= floor:
+                return
+        key = self._key(config)
+        old = self.entries.get(key)
+        if old is None or stats[0] > old[0][0]:
+            self._put(key, stats, config if old is None else old[1])
+
+    def clear(self):
+        self.entries.clear()
+        self.slots.clear()
+        self.heap = []
+
+
+def significant_gaps(results):
+    # For ranked results (income, categories, CI half-width): whether each income is significantly above the
+    # next one, i.e. the gap exceeds the combined half-width of the difference. That treats the estimates as
+    # independent; common random numbers correlate them positively, so it errs on the careful side. The last
+    # menu has nothing below it and gets None.
+    return [a[0] - b[0] > math.hypot(a[2], b[2]) for a, b in zip(results, results[1:])] + [None] * bool(results)
+
+
+class SearchContext:
+    # Everything a search strategy needs: candidate generation and moves on slot ID tuples, batched cached
+    # evaluation, the best menus found so far, progress reports and the budget.
+    def __init__(self, compiled, max_ing_per_cat, sims_per_eval, engine, pool, cache, progress=None, cancel=None,
+                 budget_sims=None, budget_seconds=None, seed=None, common_random_numbers=None, profile=None,
+                 checkpoint=None, k=None):
+        self.compiled = compiled
+        self.max_ing_per_cat = max_ing_per_cat
+        self.sims_per_eval = sims_per_eval
+        self.engine = engine
+        self.pool = pool
+        self.cache = cache
+        self.progress = progress
+        self.cancel = cancel
+        self.budget_sims = budget_sims
+        self.budget_seconds = budget_seconds
+        self.seed = seed
+        # Candidate menus, moves and acceptance draws come from the master seed too (-1 is no slot ID, so this
+        # stream is never a menu's), which makes a seeded run reproducible as a whole
+        self.rng = random.Random(stream_seed(seed, -1) if seed is not None else random.getrandbits(64))
+        self.profile = profile if profile is not None else RunProfile()
+        self.common_random_numbers = (TOP3_COMMON_RANDOM_NUMBERS if common_random_numbers is None
+                                      else common_random_numbers)
+        self.checkpoint = checkpoint
+        self.phase = "search"
+        self.start_time = time.time()
+        self.sims_used = 0
+        self.evaluated = 0
+        self.best = Leaderboard(compiled, k)
+        self.k = self.best.k
+        self.n_cats = len(compiled.categories)
+        self.enabled = [compiled.enabled_slots(ci) for ci in range(self.n_cats)]
+
+    def random_config(self):
+        config = []
+        for enabled_slots in self.enabled:
+            if not enabled_slots:
+                continue
+            k = self.rng.randint(1, min(len(enabled_slots), self.max_ing_per_cat))
+            config.extend(self.rng.sample(enabled_slots, k))
+        return tuple(sorted(config))
+
+    def split(self, config):
+        groups = [[] for _ in range(self.n_cats)]
+        for i in config:
+            groups[self.compiled.slot_category[i]].append(i)
+        return groups
+
+    def neighbour_configs(self, config, limit=None):
+        # All add/remove/swap moves; with a limit a random subset of them. Returns (configs, complete).
+        neighbours = []
+        chosen = set(config)
+        groups = self.split(config)
+        for ci, selected in enumerate(groups):
+            unselected = [i for i in self.enabled[ci] if i not in chosen]
+            rest = [i for i in config if self.compiled.slot_category[i] != ci]
+            for i in selected:
+                neighbours.append(rest + [x for x in selected if x != i])
+            if len(selected) < self.max_ing_per_cat:
+                for i in unselected:
+                    neighbours.append(config + (i,))
+            for old in selected:
+                for i in unselected:
+                    neighbours.append(rest + [i if x == old else x for x in selected])
+
+        complete = True
+        if limit and len(neighbours) > limit:
+            neighbours = self.rng.sample(neighbours, limit)
+            complete = False
+        return [tuple(sorted(n)) for n in neighbours], complete
+
+    def random_neighbour(self, config):
+        groups = self.split(config)
+        chosen = set(config)
+        moves = []
+        for ci, selected in enumerate(groups):
+            unselected = [i for i in self.enabled[ci] if i not in chosen]
+            if selected:
+                moves.append(("remove", ci, selected, unselected))
+                if unselected:
+                    moves.append(("swap", ci, selected, unselected))
+            if unselected and len(selected) < self.max_ing_per_cat:
+                moves.append(("add", ci, selected, unselected))
+        if not moves:
+            return config
+        op, ci, selected, unselected = self.rng.choice(moves)
+        new_config = [i for i in config if self.compiled.slot_category[i] != ci]
+        if op == "remove":
+            selected = self.rng.sample(selected, len(selected) - 1)
+        elif op == "add":
+            selected = selected + [self.rng.choice(unselected)]
+        else:
+            old = self.rng.choice(selected)
+            new = self.rng.choice(unselected)
+            selected = [new if x == old else x for x in selected]
+        return tuple(sorted(new_config + selected))
+
+    def crossover(self, a, b):
+        # Uniform crossover over categories: each category's ingredient subset comes from one of the parents
+        child = []
+        for group_a, group_b in zip(self.split(a), self.split(b)):
+            child.extend(group_a if self.rng.random() < 0.5 else group_b)
+        return tuple(sorted(child))
+
+    def streams(self, configs):
+        # Random stream of every config: one shared stream gives common random numbers, otherwise each config
+        # gets its own stream derived from its slot IDs, so the numbers do not depend on evaluation order.
+        if self.seed is None:
+            return None
+        if self.common_random_numbers:
+            return [stream_seed(self.seed)] * len(configs)
+        return [stream_seed(self.seed, *config) for config in configs]
+
+    def evaluate(self, configs, sims=None, track=True, already=0):
+        # `already` is how many of the `sims` simulations every config has had before (racing stages): the
+        # cache only runs the rest, so only those count against the budget
+        if sims is None:
+            sims = self.sims_per_eval
+        results = []
+        for start in range(0, len(configs), TOP3_PROGRESS_BATCH):
+            if self.cancel is not None and self.cancel.is_set():
+                raise SearchCancelled()
+            block = configs[start:start + TOP3_PROGRESS_BATCH]
+            if not already:
+                self.evaluated += len(block)
+                self.profile.count("menus evaluated", len(block))
+            self.sims_used += len(block) * (sims - already)
+            with self.profile.phase("cache"):
+                block_results = self.cache.evaluate(
+                    self.compiled, block, sims, self.engine,
+                    lambda todo, n, offset: self.pool.evaluate(self.compiled, todo, n, self.engine, self.cancel,
+                                                               self.streams(todo), offset, self.profile))
+            results.extend(block_results)
+            if self.checkpoint is not None:
+                self.checkpoint.record(block, block_results)
+                self.checkpoint.maybe_save(self)
+        if track:
+            self.update_best(zip(results, configs))
+        return results
+
+    def update_best(self, scored):
+        for stats, config in scored:
+            self.best.offer(stats, config)
+
+    def results_of(self, scored):
+        if not isinstance(scored, Leaderboard):
+            board = Leaderboard(self.compiled, self.k)
+            for stats, config in scored:
+                board.offer(stats, config)
+            scored = board
+        # Each menu is reported as (income, categories, half-width of the income confidence interval)
+        return [(stats_mean(stats), self.compiled.decode(config), stats_ci(stats)) for stats, config in scored]
+
+    def report(self, phase, done, total, scored=None):
+        if self.progress is not None:
+            self.progress({"phase": phase, "done": done, "total": total, "evaluated": self.evaluated,
+                           "best": self.results_of(self.best if scored is None else scored)})
+
+    def budget_fraction(self):
+        # A budget of 0 is spent from the start
+        fraction = 0.0
+        if self.budget_sims is not None:
+            fraction = max(fraction, self.sims_used / self.budget_sims if self.budget_sims > 0 else 1.0)
+        if self.budget_seconds is not None:
+            elapsed = time.time() - self.start_time
+            fraction = max(fraction, elapsed / self.budget_seconds if self.budget_seconds > 0 else 1.0)
+        return min(fraction, 1.0)
+
+    def exhausted(self):
+        return (self.budget_sims is not None or self.budget_seconds is not None) and self.budget_fraction() >= 1.0
+
+
+class RandomSearch:
+    # Uniform random menus, optionally raced (see TOP3_RACING)
+    def __init__(self, iterations=None, racing=None):
+        self.iterations = TOP3_ITERATIONS if iterations is None else iterations
+        self.racing = TOP3_RACING if racing is None else racing
+
+    def run(self, ctx):
+        configs = [ctx.random_config() for _ in range(self.iterations)]
+        if self.racing:
+            ctx.update_best(self.race(ctx, configs, ctx.k))
+            return
+        for start in range(0, len(configs), TOP3_PROGRESS_BATCH):
+            if ctx.exhausted():
+                break
+            ctx.evaluate(configs[start:start + TOP3_PROGRESS_BATCH])
+            ctx.report("sampling", min(start + TOP3_PROGRESS_BATCH, len(configs)), len(configs))
+
+    def race(self, ctx, configs, keep):
+        # Successive halving: every stage gives the surviving candidates a bigger batch of simulations and
+        # drops those whose upper confidence bound falls below the keep-th best lower bound. The cache merges
+        # the batches, so each stage asks for the cumulative number of simulations. Once the budget is spent
+        # the race stops with the estimates it has.
+        if ctx.exhausted():
+            return []
+        sims_per_eval = ctx.sims_per_eval
+        stats = [(0, 0.0, 0.0)] * len(configs)
+        alive = list(range(len(configs)))
+        batch = min(RACING_FIRST_BATCH, sims_per_eval)
+        spent = 0
+        while True:
+            batch = min(batch, sims_per_eval - spent)
+            previous, spent = spent, spent + batch
+            for start in range(0, len(alive), TOP3_PROGRESS_BATCH):
+                if start and ctx.exhausted():
+                    break
+                block = alive[start:start + TOP3_PROGRESS_BATCH]
+                for i, result in zip(block, ctx.evaluate([configs[i] for i in block], spent, False, previous)):
+                    stats[i] = result
+            # Candidates the budget never reached have no estimate
+            alive = [i for i in alive if stats[i][0]]
+            ctx.report("racing", spent, sims_per_eval, [(stats[i], configs[i]) for i in alive])
+            if spent >= sims_per_eval or len(alive) <= keep or ctx.exhausted():
+                break
+            lower = sorted((stats_mean(stats[i]) - stats_ci(stats[i]) for i in alive), reverse=True)
+            threshold = lower[keep - 1]
+            alive = [i for i in alive if stats_mean(stats[i]) + stats_ci(stats[i]) >= threshold]
+            batch *= RACING_GROWTH
+        return [(stats[i], configs[i]) for i in alive]
+
+
+class SimulatedAnnealing:
+    # Parallel annealing chains; every round proposes one random move per chain and scores them as one batch.
+    # The temperature (in income units) cools geometrically with the spent share of the budget. Chains start
+    # from random menus or, if given, from the `initial` configs in turn.
+    def __init__(self, chains=None, start_temp=None, end_temp=None, initial=None):
+        self.chains = ANNEAL_CHAINS if chains is None else chains
+        self.start_temp = ANNEAL_START_TEMP if start_temp is None else start_temp
+        self.end_temp = ANNEAL_END_TEMP if end_temp is None else end_temp
+        self.initial = initial
+
+    def run(self, ctx):
+        if ctx.exhausted():
+            return
+        if self.initial:
+            current = [self.initial[i % len(self.initial)] for i in range(self.chains)]
+        else:
+            current = [ctx.random_config() for _ in range(self.chains)]
+        current_stats = ctx.evaluate(current)
+        start_fraction = ctx.budget_fraction()
+        while not ctx.exhausted():
+            # Cool over the part of the budget that is left when the chains start
+            fraction = (ctx.budget_fraction() - start_fraction) / max(1.0 - start_fraction, 1e-9)
+            temp = self.start_temp * (self.end_temp / self.start_temp) ** fraction
+            proposals = [ctx.random_neighbour(config) for config in current]
+            for i, stats in enumerate(ctx.evaluate(proposals)):
+                delta = stats_mean(stats) - stats_mean(current_stats[i])
+                if delta >= 0 or ctx.rng.random() < math.exp(delta / temp):
+                    current[i] = proposals[i]
+                    current_stats[i] = stats
+            ctx.report("annealing", round(100 * ctx.budget_fraction()), 100)
+
+
+class GeneticSearch:
+    # Generational GA: tournament selection, per-category uniform crossover, random-move mutation and elitism
+    def __init__(self, population=None, elite=None, mutation=None, tournament=None):
+        self.population = GA_POPULATION if population is None else population
+        self.elite = GA_ELITE if elite is None else elite
+        self.mutation = GA_MUTATION if mutation is None else mutation
+        self.tournament = GA_TOURNAMENT if tournament is None else tournament
+
+    def select(self, ctx, scored):
+        contestants = ctx.rng.sample(scored, min(self.tournament, len(scored)))
+        return max(contestants, key=lambda x: stats_mean(x[0]))[1]
+
+    def run(self, ctx):
+        if ctx.exhausted():
+            return
+        population = [ctx.random_config() for _ in range(self.population)]
+        scored = list(zip(ctx.evaluate(population), population))
+        while not ctx.exhausted():
+            scored.sort(key=lambda x: stats_mean(x[0]), reverse=True)
+            children = []
+            while len(children) < self.population - self.elite:
+                child = ctx.crossover(self.select(ctx, scored), self.select(ctx, scored))
+                if ctx.rng.random() < self.mutation:
+                    child = ctx.random_neighbour(child)
+                children.append(child)
+            scored = scored[:self.elite] + list(zip(ctx.evaluate(children), children))
+            ctx.report("genetic", round(100 * ctx.budget_fraction()), 100)
+
+
+def optimal_menus(menu, k=3, max_ing_per_cat=None, workers=None, pool=None, time_limit=None, seeds=(),
+                  cancel=None, progress=None, profile=None):
+    # Branch and bound over per-category subsets (up to max_ing_per_cat each, empty allowed) using the exact
+    # evaluator. Subtrees are spread over the pool; `seeds` are known good configs that tighten the pruning
+    # from the start. Returns (menus, info): menus as in compute_top3_menus, info with "proven", the
+    # remaining "gap" between the best unexplored bound and the k-th menu (None if unknown), and the visited "nodes".
+    if max_ing_per_cat is None:
+        max_ing_per_cat = TOP3_MAX_ING_PER_CAT
+    compiled = menu if isinstance(menu, CompiledMenu) else CompiledMenu(menu)
+    subsets = {ci: _category_subsets(compiled, ci, max_ing_per_cat) for ci in range(len(compiled.categories))
+               if compiled.enabled_slots(ci)}
+    # Small categories first: the bound gets tight before the big fan-outs
+    order = sorted(subsets, key=lambda ci: len(subsets[ci]))
+    deadline = time.time() + time_limit if time_limit else None
+
+    seed_values = {}
+    for config in seeds:
+        try:
+            seed_values[config] = expected_income_compiled(compiled, config)
+        except ExactStateLimitExceeded:
+            pass
+    if not _names_unique_per_category(compiled):
+        # An ingredient name in several categories breaks the upper bound, so nothing would be pruned and the
+        # search would enumerate menus until the time limit: report the seeds unproven instead
+        ranked = sorted(seed_values.items(), key=lambda x: x[1], reverse=True)[:k]
+        info = {"proven": False, "gap": None, "nodes": 0, "unbounded": "ingredient names shared between categories"}
+        return [(value, compiled.decode(config), 0.0) for config, value in ranked], info
+    own_pool = pool is None
+    if own_pool:
+        pool = make_pool(workers)
+    threshold = (sorted(seed_values.values(), reverse=True)[k - 1] - 1e-9 if len(seed_values) >= k
+                 else float("-inf"))
+
+    # Bound of every menu. It caps the subtree bounds, which are infinite where the optimistic chain is beyond
+    # EXACT_MAX_STATES, and covers the subtrees still open when the deadline hits.
+    menu_bound = menu_upper_bound(compiled, [], order, max_ing_per_cat)
+
+    # Cancellation is only seen between jobs, so even a single worker gets the tree in many subtrees
+    prefixes = [()]
+    depth = 0
+    while depth < len(order) - 1 and len(prefixes) < max(BNB_SUBTREES, pool.workers * 8):
+        prefixes = [prefix + (subset,) for prefix in prefixes for subset in subsets[order[depth]]]
+        depth += 1
+    bounds = {}
+    found = {}
+    open_bound = None
+    nodes = 0
+    done = 0
+
+    def ranked_menus():
+        return sorted(found.items(), key=lambda x: x[1][0], reverse=True)[:k]
+
+    def cutoff():
+        ranked = ranked_menus()
+        return max(threshold, ranked[-1][1][0] - 1e-9) if len(ranked) >= k else threshold
+
+    def give_up(bound):
+        nonlocal open_bound
+        if bound is not None and (open_bound is None or bound > open_bound):
+            open_bound = bound
+
+    def on_result(index, result):
+        nonlocal nodes, done
+        top, job_open_bound, job_nodes = result
+        nodes += job_nodes
+        done += 1
+        for value, config, is_exact in top:
+            found[config] = (value, is_exact)
+        give_up(job_open_bound)
+        if progress is not None:
+            best = [(value, compiled.decode(config), 0.0) for config, (value, _) in ranked_menus()]
+            progress({"phase": "branch and bound", "done": done, "total": len(prefixes),
+                      "evaluated": nodes, "best": best})
+
+    # Subtrees go out in waves so every wave prunes with the best menus the earlier ones found
+    wave = 1 if pool.workers <= 1 else pool.workers * 2
+    try:
+        # Most promising subtrees first, so the later ones are pruned against good menus. The jobs reuse these
+        # bounds; prefixes not reached by the deadline go last with the whole-menu bound.
+        if depth:
+            for prefix in prefixes:
+                if cancel is not None and cancel.is_set():
+                    raise SearchCancelled()
+                if deadline is not None and time.time() > deadline:
+                    break
+                bounds[prefix] = min(menu_bound, menu_upper_bound(compiled, list(prefix), order[depth:],
+                                                                  max_ing_per_cat))
+            prefixes.sort(key=lambda prefix: -bounds.get(prefix, float("-inf")))
+        for start in range(0, len(prefixes), wave):
+            if deadline is not None and time.time() > deadline:
+                give_up(menu_bound)
+                break
+            payloads = [(order, prefix, bounds.get(prefix, menu_bound), cutoff(), k, max_ing_per_cat, deadline)
+                        for prefix in prefixes[start:start + wave]]
+            pool.run(compiled, branch_and_bound_job, payloads, cancel, on_result, profile)
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    ranked = ranked_menus()
+    exact = all(is_exact for _, (_, is_exact) in ranked)
+    kth = ranked[-1][1][0] if len(ranked) >= k else float("-inf")
+    gap = 0.0 if open_bound is None else max(0.0, open_bound - kth)
+    if not math.isfinite(gap):
+        # No finite bound on what is left (or fewer than k menus found): the gap is unknown
+        gap = None
+    info = {"proven": open_bound is None and exact and bool(ranked), "gap": gap, "nodes": nodes}
+    # Exact incomes have no sampling noise, so the confidence interval is zero
+    menus = [(value, compiled.decode(config), 0.0 if is_exact else float("nan"))
+             for config, (value, is_exact) in ranked]
+    return menus, info
+
+
+class BranchAndBound:
+    # Exhaustive search with proven top-K (see optimal_menus); a short genetic search seeds the pruning
+    def __init__(self, time_limit=None, seed_evaluations=None):
+        self.time_limit = BNB_TIME_LIMIT if time_limit is None else time_limit
+        self.seed_evaluations = BNB_SEED_EVALUATIONS if seed_evaluations is None else seed_evaluations
+        self.info = None
+
+    def run(self, ctx):
+        if not _names_unique_per_category(ctx.compiled):
+            # Nothing can be pruned (see optimal_menus), so the whole budget goes to the genetic search
+            self.info = {"proven": False, "gap": None, "nodes": 0,
+                         "unbounded": "ingredient names shared between categories"}
+            GeneticSearch().run(ctx)
+            return
+        budget = (ctx.budget_sims, ctx.budget_seconds)
+        ctx.budget_sims = ctx.sims_used + self.seed_evaluations * ctx.sims_per_eval
+        ctx.budget_seconds = None
+        try:
+            GeneticSearch().run(ctx)
+        finally:
+            ctx.budget_sims, ctx.budget_seconds = budget
+
+        time_limit = self.time_limit
+        if ctx.budget_seconds:
+            remaining = max(ctx.budget_seconds - (time.time() - ctx.start_time), 1.0)
+            time_limit = min(time_limit, remaining) if time_limit else remaining
+        seeds = [config for _, config in ctx.best]
+        menus, self.info = optimal_menus(ctx.compiled, ctx.k, ctx.max_ing_per_cat, pool=ctx.pool, time_limit=time_limit,
+                                         seeds=seeds, cancel=ctx.cancel, progress=ctx.progress, profile=ctx.profile)
+        n = ctx.sims_per_eval
+        scored = [((n, value * n, value * value * n), ctx.compiled.encode(categories))
+                  for value, categories, _ in menus]
+        ctx.best.clear()
+        ctx.update_best(scored)
+
+
+class WarmStartSearch:
+    # Re-optimisation after small menu edits. Starts from the previous run's best menus, scores them with the
+    # edited and added ingredients swapped or added in, then anneals around the best of them at a low
+    # temperature for a share of the usual budget. Menus the edits did not touch are still in the evaluation
+    # cache, so only those with changed ingredients are simulated again.
+    def __init__(self, previous_menu, previous_top, budget_share=None):
+        # previous_top holds the earlier best menus as {category: [ingredient names]}
+        self.previous_menu = previous_menu
+        self.previous_top = previous_top
+        self.budget_share = WARM_START_BUDGET if budget_share is None else budget_share
+
+    def changed_slots(self, compiled):
+        old = {(cat, ing["name"], ing["price"], ing["unique_bonus"], ing["finish_chance"])
+               for cat, items in self.previous_menu["categories"].items()
+               for ing in items if ing.get("enabled", True)}
+        return [i for ci in range(len(compiled.categories)) for i in compiled.enabled_slots(ci)
+                if (compiled.categories[ci], *slot_content(compiled, i)) not in old]
+
+    def seeds(self, ctx):
+        seeds = []
+        for categories_names in self.previous_top:
+            config = ctx.compiled.encode_names(categories_names)
+            if config and config not in seeds:
+                seeds.append(config)
+        return seeds
+
+    def run(self, ctx):
+        if ctx.budget_sims is not None:
+            ctx.budget_sims = ctx.sims_used + ctx.budget_sims * self.budget_share
+        if ctx.budget_seconds is not None:
+            ctx.budget_seconds *= self.budget_share
+        seeds = self.seeds(ctx)
+        if not seeds:
+            GeneticSearch().run(ctx)
+            return
+
+        candidates = list(seeds)
+        for i in self.changed_slots(ctx.compiled):
+            ci = ctx.compiled.slot_category[i]
+            for config in seeds:
+                if i in config:
+                    continue
+                group = ctx.split(config)[ci]
+                rest = [x for x in config if ctx.compiled.slot_category[x] != ci]
+                if len(group) < ctx.max_ing_per_cat:
+                    candidates.append(tuple(sorted(config + (i,))))
+                for old in group:
+                    candidates.append(tuple(sorted(rest + [i if x == old else x for x in group])))
+        candidates = list(dict.fromkeys(candidates))
+        scored = list(zip(ctx.evaluate(candidates), candidates))
+        ctx.report("warm start", 1, 1)
+
+        scored.sort(key=lambda x: stats_mean(x[0]), reverse=True)
+        initial = [config for _, config in scored[:ANNEAL_CHAINS]]
+        SimulatedAnnealing(start_temp=WARM_START_TEMP, end_temp=ANNEAL_END_TEMP, initial=initial).run(ctx)
+
+
+def make_warm_start(previous_menu, previous_top, menu):
+    # WarmStartSearch for re-running on `menu` after the run that found `previous_top` on `previous_menu`, or
+    # None if there is nothing to start from, nothing changed or too much changed for a warm start to pay off.
+    if previous_menu is None or not previous_top:
+        return None
+    if previous_menu["bottom_bun"] != menu["bottom_bun"] or previous_menu["top_bun"] != menu["top_bun"]:
+        return None
+    strategy = WarmStartSearch(previous_menu, previous_top)
+    compiled = CompiledMenu(menu)
+    total = sum(len(compiled.enabled_slots(ci)) for ci in range(len(compiled.categories)))
+    changed = len(strategy.changed_slots(compiled))
+    previous = sum(1 for items in previous_menu["categories"].values() for ing in items if ing.get("enabled", True))
+    # Edits count once: as a new slot and as a previous one that is gone
+    differences = max(changed, previous - (total - changed))
+    if differences == 0 or differences > WARM_START_MAX_CHANGED * max(total, 1):
+        return None
+    return strategy
+
+
+SEARCH_STRATEGIES = {
+    "random": RandomSearch,
+    "annealing": SimulatedAnnealing,
+    "genetic": GeneticSearch,
+    "branch_and_bound": BranchAndBound,
+}
+
+
+def make_strategy(name, iterations=None, racing=None):
+    # Racing is a way of scoring random menus, so it picks random search unless another strategy is named
+    if name is None:
+        name = "random" if (TOP3_RACING if racing is None else racing) else TOP3_STRATEGY
+    if name not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown search strategy: {name!r}")
+    if racing and name != "random":
+        raise ValueError(f"Racing only works with the random strategy, not {name!r}")
+    if name == "random":
+        return RandomSearch(iterations, racing)
+    return SEARCH_STRATEGIES[name]()
+
+
+def refine_menus(ctx, current, refine_steps):
+    # Steepest ascent for all candidates at once: every step scores the neighbourhoods of all still
+    # improving candidates as one batch and moves each of them to its best improving neighbour.
+    # `current` holds (stats, config) pairs and is updated in place, so a cancelled run keeps its progress.
+    # It stops early once the search budget is spent.
+    active = list(range(len(current)))
+
+    for step in range(refine_steps):
+        if not active or ctx.exhausted():
+            break
+        batch, owners, exhausted = [], [], set()
+        for i in active:
+            new_cfgs, complete = ctx.neighbour_configs(current[i][1], TOP3_REFINE_NEIGHBOURS)
+            batch.extend(new_cfgs)
+            owners.extend([i] * len(new_cfgs))
+            if complete:
+                exhausted.add(i)
+
+        best_moves = {}
+        for start in range(0, len(batch), TOP3_PROGRESS_BATCH):
+            if start and ctx.exhausted():
+                break
+            block = batch[start:start + TOP3_PROGRESS_BATCH]
+            for i, new_cfg, stats in zip(owners[start:start + TOP3_PROGRESS_BATCH], block, ctx.evaluate(block)):
+                if i not in best_moves or stats_mean(stats) > stats_mean(best_moves[i][0]):
+                    best_moves[i] = (stats, new_cfg)
+
+        still_active = []
+        for i in active:
+            move = best_moves.get(i)
+            if move is not None and stats_mean(move[0]) > stats_mean(current[i][0]):
+                current[i] = move
+                still_active.append(i)
+            elif i not in exhausted:
+                still_active.append(i)
+        active = still_active
+        ctx.report("refining", step + 1, refine_steps, current)
+
+
+class CheckpointRejected(ValueError):
+    pass
+
+
+def checkpoint_path(menu_path):
+    if not menu_path:
+        return DEFAULT_CHECKPOINT_FILE
+    return os.path.splitext(menu_path)[0] + CHECKPOINT_SUFFIX
+
+
+class SearchCheckpoint:
+    # Compact snapshot of a running Top 3 search: the master seed and the state of the search's own random
+    # generator (SearchContext.rng) at its start, every config evaluated so far with its stats, the phase and
+    # the progress. Searches are deterministic given these, so resuming replays the run with the evaluated
+    # configs served from the cache and carries on where it stopped. Only wall-clock budgets and racing on
+    # topped-up entries can make a replay take a different turn, which still gives a valid search.
+    def __init__(self, path, compiled, settings, seed, random_state=None, entries=None, interval=None):
+        if interval is None:
+            interval = TOP3_CHECKPOINT_SECONDS
+        self.path = path
+        self.fingerprint = compiled.fingerprint
+        self.settings = settings
+        self.seed = seed
+        self.random_state = random_state
+        self.entries = dict(entries or {})
+        self.interval = interval
+        self.last_save = time.time()
+        # Where a loaded checkpoint had got to: the phase and the share of the budget used
+        self.phase = None
+        self.progress = None
+
+    def record(self, configs, results):
+        for config, stats in zip(configs, results):
+            old = self.entries.get(config)
+            if old is None or old[0] < stats[0]:
+                self.entries[config] = stats
+
+    def maybe_save(self, ctx):
+        if self.interval is not None and time.time() - self.last_save >= self.interval:
+            self.save(ctx)
+
+    def save(self, ctx):
+        version, state, gauss = self.random_state
+        data = {
+            "fingerprint": self.fingerprint,
+            "settings": self.settings,
+            "seed": self.seed,
+            "random_state": [version, list(state), gauss],
+            "phase": ctx.phase,
+            "evaluated": ctx.evaluated,
+            "sims_used": ctx.sims_used,
+            "budget_fraction": ctx.budget_fraction(),
+            "best": [[list(config), *stats] for stats, config in ctx.best],
+            "entries": [[list(config), *stats] for config, stats in self.entries.items()],
+        }
+        # Written to a temporary file first, so an interrupted write never destroys the previous checkpoint
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+        self.last_save = time.time()
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    @classmethod
+    def load(cls, path, compiled, settings):
+        # The checkpoint at `path`, or None if there is none; raises CheckpointRejected if it was written for
+        # another menu or other search settings, as replaying it would not continue the same search.
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            raise CheckpointRejected(f"unreadable checkpoint ({e})")
+        if data.get("fingerprint") != compiled.fingerprint:
+            raise CheckpointRejected("the menu changed since the checkpoint was written")
+        if data.get("settings") != settings:
+            raise CheckpointRejected("the search settings changed since the checkpoint was written")
+        version, state, gauss = data["random_state"]
+        entries = {tuple(config): tuple(stats) for config, *stats in data["entries"]}
+        checkpoint = cls(path, compiled, settings, data["seed"], (version, tuple(state), gauss), entries)
+        checkpoint.phase = data.get("phase")
+        checkpoint.progress = data.get("budget_fraction")
+        return checkpoint
+
+
+def _strategy_name(strategy):
+    for name, cls in SEARCH_STRATEGIES.items():
+        if type(strategy) is cls:
+            return name
+    return type(strategy).__name__
+
+
+def compute_top3_menus(menu, iterations=None, sims_per_eval=None, max_ing_per_cat=None, refine_steps=None,
+                       workers=None, engine=None, racing=None, pool=None, cache=None, progress=None, cancel=None,
+                       strategy=None, budget_sims=None, budget_seconds=None, seed=None, common_random_numbers=None,
+                       profile=None, final_precision=None, checkpoint=None, resume=False, k=None):
+    # Returns the best `k` distinct menus (TOP3_K by default) of everything evaluated, refinement included.
+    # progress(info) is called after every batch with the phase, how far it is, how many menus were evaluated
+    # and the best ones so far. Setting the `cancel` event stops the run; the best menus found are returned.
+    # `strategy` is a SEARCH_STRATEGIES name or an object with run(ctx); the budget defaults to the
+    # simulations of `iterations` full evaluations. `seed` fixes the whole run: the Monte Carlo random streams
+    # and the search's own random choices (by default it is drawn from the global random module). Pass a
+    # RunProfile to see where the time went. With a Monte Carlo engine, `final_precision` re-evaluates the
+    # final menus until their confidence interval half-width is at most that.
+    # With a `checkpoint` path (see checkpoint_path) the search state is written there every
+    # TOP3_CHECKPOINT_SECONDS and when the run is cancelled, and removed once the run completes. With `resume`
+    # a checkpoint found there is picked up again (see SearchCheckpoint); CheckpointRejected is raised if it
+    # belongs to another menu or other settings.
+    if iterations is None:
+        iterations = TOP3_ITERATIONS
+    if sims_per_eval is None:
+        sims_per_eval = TOP3_SIMS_PER_EVAL
+    if max_ing_per_cat is None:
+        max_ing_per_cat = TOP3_MAX_ING_PER_CAT
+    if refine_steps is None:
+        refine_steps = TOP3_REFINE_STEPS
+    if engine is None:
+        engine = TOP3_ENGINE
+    # An explicit budget covers the whole run, refinement included; the one derived from `iterations` only
+    # the strategy, and refinement is then limited by refine_steps alone
+    explicit_budget = budget_sims is not None or budget_seconds is not None
+    if not explicit_budget:
+        budget_sims = TOP3_BUDGET_SIMS if TOP3_BUDGET_SIMS is not None else iterations * sims_per_eval
+        budget_seconds = TOP3_BUDGET_SECONDS
+        explicit_budget = TOP3_BUDGET_SIMS is not None or TOP3_BUDGET_SECONDS is not None
+    if strategy is None or isinstance(strategy, str):
+        strategy = make_strategy(strategy, iterations, racing)
+    if seed is None:
+        seed = TOP3_SEED if TOP3_SEED is not None else random.getrandbits(64)
+    if final_precision is None:
+        final_precision = TOP3_FINAL_PRECISION
+    if common_random_numbers is None:
+        common_random_numbers = TOP3_COMMON_RANDOM_NUMBERS
+    if k is None:
+        k = TOP3_K
+
+    compiled = CompiledMenu(menu)
+    saved = None
+    if checkpoint is not None:
+        settings = {"strategy": _strategy_name(strategy), "iterations": iterations, "sims_per_eval": sims_per_eval,
+                    "max_ing_per_cat": max_ing_per_cat, "refine_steps": refine_steps, "engine": engine,
+                    "racing": getattr(strategy, "racing", None), "budget_sims": budget_sims,
+                    "budget_seconds": budget_seconds, "common_random_numbers": common_random_numbers,
+                    "final_precision": final_precision, "k": k}
+        if resume:
+            saved = SearchCheckpoint.load(checkpoint, compiled, settings)
+        if saved is not None:
+            seed = saved.seed
+        else:
+            saved = SearchCheckpoint(checkpoint, compiled, settings, seed)
+
+    own_pool = pool is None
+    if own_pool:
+        pool = make_pool(workers)
+    if cache is None:
+        cache = EvaluationCache()
+    if profile is None:
+        profile = RunProfile()
+
+    profile.start()
+    if saved is not None:
+        for config, stats in saved.entries.items():
+            cache.put(compiled, engine, config, stats)
+    hits, misses = cache.hits, cache.misses
+    ctx = SearchContext(compiled, max_ing_per_cat, sims_per_eval, engine, pool, cache, progress, cancel,
+                        budget_sims, budget_seconds, seed, common_random_numbers, profile, saved, k)
+    if saved is not None:
+        # The search replays from its own generator; the global random module is left alone
+        if saved.random_state is None:
+            saved.random_state = ctx.rng.getstate()
+        else:
+            ctx.rng.setstate(saved.random_state)
+    share = TOP3_REFINE_SHARE if explicit_budget else 0.0
+    if budget_sims is not None:
+        ctx.budget_sims = budget_sims * (1.0 - share)
+    if budget_seconds is not None:
+        ctx.budget_seconds = budget_seconds * (1.0 - share)
+    try:
+        # Strategies spend their own time generating candidate menus; evaluations are timed separately
+        with profile.phase("config generation"):
+            strategy.run(ctx)
+
+        ctx.phase = "refinement"
+        if explicit_budget:
+            ctx.budget_sims, ctx.budget_seconds = budget_sims, budget_seconds
+        else:
+            ctx.budget_sims = ctx.budget_seconds = None
+        with profile.phase("refinement"):
+            # Every neighbour scored on the way goes to the leaderboard, so it ends with the best distinct
+            # menus around the refined ones
+            start_cfgs = [cfg for _, cfg in ctx.best]
+            refined = list(zip(ctx.evaluate(start_cfgs), start_cfgs))
+            # A proven optimum cannot be improved by local search
+            if not (getattr(strategy, "info", None) or {}).get("proven"):
+                refine_menus(ctx, refined, refine_steps)
+
+        if final_precision and engine != "exact":
+            ctx.phase = "final precision"
+            with profile.phase("final precision"):
+                for stats, config in ctx.best.ranked():
+                    ctx.best.offer(evaluate_menu_stats(ctx.compiled, config, final_precision, engine=engine,
+                                                       pool=pool, seed=ctx.streams([config])[0], stats=stats,
+                                                       cancel=cancel, profile=profile), config)
+        if saved is not None:
+            saved.discard()
+    except SearchCancelled:
+        if saved is not None:
+            saved.save(ctx)
+    finally:
+        if own_pool:
+            with profile.phase("pool shutdown"):
+                pool.shutdown()
+    with profile.phase("ranking"):
+        cache.save()
+        results = ctx.results_of(ctx.best)
+    profile.count("cache hits", cache.hits - hits)
+    profile.count("cache misses", cache.misses - misses)
+    profile.stop()
+    return results
+
+
+def _menu_names(menu):
+    # {category: [ingredient names]} of a menu given as a compute_top3_menus result, a categories dict with
+    # ingredient dicts or one that already holds names
+    if isinstance(menu, tuple):
+        menu = menu[1]
+    return {cat: [ing if isinstance(ing, str) else ing["name"] for ing in ings] for cat, ings in menu.items()}
+
+
+def sweep_variants(menu, top_menus, factors=None, fields=None):
+    # One-at-a-time perturbations of everything the incomes of the fixed `top_menus` depend on: each field of
+    # every ingredient they use and the bun prices and bonuses, each multiplied by every factor. A variant is
+    # (label, [(target, field, value)]) with target "bottom_bun", "top_bun" or (category, ingredient name).
+    if factors is None:
+        factors = SWEEP_FACTORS
+    if fields is None:
+        fields = SWEEP_FIELDS
+    used = {(cat, name) for top in top_menus for cat, names in _menu_names(top).items() for name in names}
+    variants = []
+    for bun in ("bottom_bun", "top_bun"):
+        for field in ("price", "unique_bonus"):
+            for factor in factors:
+                variants.append((f"{bun}.{field} x{factor:g}", [(bun, field, menu[bun][field] * factor)]))
+    for cat, items in menu["categories"].items():
+        for ing in items:
+            if (cat, ing["name"]) not in used:
+                continue
+            for field in fields:
+                for factor in factors:
+                    variants.append((f"{cat}/{ing['name']}.{field} x{factor:g}",
+                                     [((cat, ing["name"]), field, ing[field] * factor)]))
+    return variants
+
+
+def sweep_job(compiled, payload):
+    items, sims, engine, seed = payload
+    return [simulate_config_stats(compiled.with_values(changes), config, sims, engine, seed)
+            for changes, config in items]
+
+
+def sweep_menus(menu, top_menus, variants=None, simulations=None, engine=None, pool=None, workers=None, seed=None,
+                cancel=None, progress=None):
+    # Evaluates the fixed `top_menus` (compute_top3_menus results or {category: [names]}) under every variant
+    # (see sweep_variants) in one parallel pass and returns one row per variant, most influential first.
+    # All evaluations share one random stream (common random numbers), menus a variant does not touch keep
+    # their baseline statistics and bun changes shift every income by the same amount without simulating.
+    if simulations is None:
+        simulations = TOP3_SIMS_PER_EVAL
+    if engine is None:
+        engine = TOP3_ENGINE
+    if variants is None:
+        variants = sweep_variants(menu, top_menus)
+    if seed is None:
+        seed = TOP3_SEED if TOP3_SEED is not None else random.getrandbits(64)
+    key = stream_seed(seed)
+
+    compiled = CompiledMenu(menu)
+    names = []
+    configs = []
+    for top in top_menus:
+        config = compiled.encode_names(_menu_names(top))
+        if config not in configs:
+            configs.append(config)
+            names.append(_menu_names(top))
+    slot_of = {(compiled.categories[compiled.slot_category[i]], compiled.items[i]["name"]): i
+               for i in range(len(compiled.items))}
+
+    own_pool = pool is None
+    if own_pool:
+        pool = make_pool(workers)
+    try:
+        baseline = pool.evaluate(compiled, configs, simulations, engine, cancel, [key] * len(configs))
+        plans = []
+        jobs = []
+        for label, changes in variants:
+            bun_delta = 0.0
+            slot_changes = []
+            for target, field, value in changes:
+                if target in ("bottom_bun", "top_bun"):
+                    bun_delta += value - menu[target][field]
+                elif target in slot_of:
+                    slot_changes.append((slot_of[target], field, value))
+            plan = []
+            for index, config in enumerate(configs):
+                if any(slot in config for slot, _, _ in slot_changes):
+                    plan.append(len(jobs))
+                    jobs.append((slot_changes, config))
+                else:
+                    plan.append(None)
+            plans.append((label, changes, bun_delta, plan))
+
+        chunk_size = max(1, -(-len(jobs) // (pool.workers * 4)))
+        payloads = [(jobs[i:i + chunk_size], simulations, engine, key) for i in range(0, len(jobs), chunk_size)]
+
+        done = 0
+
+        def on_result(index, result):
+            nonlocal done
+            done += 1
+            if progress is not None:
+                progress({"phase": "sweep", "done": done, "total": len(payloads), "evaluated": done, "best": []})
+
+        results = [stats for chunk in pool.run(compiled, sweep_job, payloads, cancel, on_result) for stats in chunk]
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    def shift(stats, delta):
+        n, total, total_sq = stats
+        return n, total + n * delta, total_sq + 2 * delta * total + n * delta * delta
+
+    base_incomes = [stats_mean(stats) for stats in baseline]
+    base_ranking = sorted(range(len(configs)), key=lambda i: -base_incomes[i])
+    rows = []
+    for label, changes, bun_delta, plan in plans:
+        stats = [shift(baseline[i] if job is None else results[job], bun_delta) for i, job in enumerate(plan)]
+        incomes = [stats_mean(s) for s in stats]
+        ranking = sorted(range(len(configs)), key=lambda i: -incomes[i])
+        deltas = [income - base for income, base in zip(incomes, base_incomes)]
+        rows.append({
+            "variant": label,
+            "changes": [[list(target) if isinstance(target, tuple) else target, field, value]
+                        for target, field, value in changes],
+            "incomes": incomes,
+            "ci": [stats_ci(s) for s in stats],
+            "deltas": deltas,
+            "ranking": ranking,
+            "ranking_changed": ranking != base_ranking,
+            "best_delta": incomes[ranking[0]] - base_incomes[base_ranking[0]],
+        })
+    rows.sort(key=lambda row: (not row["ranking_changed"], -max(abs(d) for d in row["deltas"]) if configs else 0))
+    return {"menus": names, "baseline": base_incomes, "ranking": base_ranking, "rows": rows}
+
+
+def compute_top3_ingredients(menu, k=None):
+    if k is None:
+        k = TOP3_K
+    ranking = []
+    for cat, items in menu["categories"].items():
+        for ing in items:
+            if not ing.get("enabled", True):
+                continue
+            score = ing["price"] + ing["unique_bonus"] - ing["finish_chance"] * ING_SCORE_FINISH_WEIGHT
+            ranking.append((score, cat, ing))
+    ranking.sort(reverse=True, key=lambda x: x[0])
+    return ranking[:k]
+
+
+def load_menu_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    loaded_cats = data.get("categories", {})
+    if isinstance(loaded_cats, list):
+        categories = {}
+        for c in loaded_cats:
+            categories[c["name"]] = c.get("items", [])
+    else:
+        categories = loaded_cats
+
+    for cat, items in categories.items():
+        for ing in items:
+            if "enabled" not in ing:
+                ing["enabled"] = True
+        items.sort(key=lambda i: i["name"])
+
+    return {
+        "bottom_bun": {"price": data.get("bottom_bun", {}).get("price", 0),
+                       "unique_bonus": data.get("bottom_bun", {}).get("unique_bonus", 0)},
+        "top_bun": {"price": data.get("top_bun", {}).get("price", 0),
+                    "unique_bonus": data.get("top_bun", {}).get("unique_bonus", 0)},
+        "categories": categories,
+    }
+
+
+class IngredientStore:
+    # The ingredients of a menu per category, each list kept sorted by name next to a sorted list of the names
+    # for bisection. `categories` is the plain {category: [ingredient dicts]} everything else reads; add to it
+    # through the store so the name lists stay in sync. Ingredient dicts are edited in place.
+    def __init__(self, categories=None):
+        self.categories = {}
+        self.names = {}
+        if categories is not None:
+            self.load(categories)
+
+    def load(self, categories):
+        self.categories = categories
+        self.names = {}
+        for cat, items in categories.items():
+            items.sort(key=lambda i: i["name"])
+            self.names[cat] = [ing["name"] for ing in items]
+
+    def add_category(self, cat):
+        if cat in self.categories:
+            return False
+        self.categories[cat] = []
+        self.names[cat] = []
+        return True
+
+    def add(self, cat, ing):
+        # Inserts an ingredient in name order and returns its position; names are unique per category
+        names = self.names[cat]
+        position = bisect.bisect_left(names, ing["name"])
+        if position < len(names) and names[position] == ing["name"]:
+            raise ValueError(f"{cat} already has an ingredient named {ing['name']!r}")
+        names.insert(position, ing["name"])
+        self.categories[cat].insert(position, ing)
+        return position
+
+    def find(self, cat, text=""):
+        # Ingredients of a category whose name contains `text` (ignoring case), in name order
+        text = text.strip().lower()
+        if not text:
+            return list(self.categories[cat])
+        return [ing for name, ing in zip(self.names[cat], self.categories[cat]) if text in name.lower()]
+
+
+def menu_result_record(path, top3_menus, elapsed):
+    significant = significant_gaps(top3_menus)
+    return {
+        "menu": path,
+        "elapsed": round(elapsed, 3),
+        "top": [
+            {
+                "rank": rank,
+                "income": income,
+                # JSON has no NaN: an unknown interval is null
+                "ci": ci if math.isfinite(ci) else None,
+                # Whether the income is significantly above the next rank's (see significant_gaps)
+                "significant": significant[rank - 1],
+                "categories": {cat: [ing["name"] for ing in ings] for cat, ings in categories_dict.items()},
+            }
+            for rank, (income, categories_dict, ci) in enumerate(top3_menus, start=1)
+        ],
+    }
+
+
+def build_arg_parser():
+    import argparse
+
+    def positive_int(text):
+        value = int(text)
+        if value < 1:
+            raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+        return value
+
+    parser = argparse.ArgumentParser(
+        description="Burger profit optimizer. Without menu files the GUI is started; with menu files the Top 3 "
+                    "search runs headless and streams one JSON line per menu.")
+    parser.add_argument("menus", nargs="*", help="menu JSON files (as written by Save Menu)")
+    parser.add_argument("--top", type=positive_int, default=None, help=f"how many best menus to report ({TOP3_K})")
+    parser.add_argument("--iterations", type=positive_int, default=None,
+                        help=f"random menus to try ({TOP3_ITERATIONS})")
+    parser.add_argument("--sims", type=positive_int, default=None,
+                        help=f"simulations per evaluation ({TOP3_SIMS_PER_EVAL})")
+    parser.add_argument("--max-ing", type=positive_int, default=None,
+                        help=f"max ingredients per category ({TOP3_MAX_ING_PER_CAT})")
+    parser.add_argument("--refine-steps", type=positive_int, default=None, help=f"refine steps ({TOP3_REFINE_STEPS})")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--remote", default=None, metavar="ADDRESSES",
+                        help="evaluate on remote workers started with --serve, e.g. node1:7000-7007,node2:7000")
+    parser.add_argument("--serve", default=None, metavar="ADDRESS",
+                        help="run remote evaluation workers instead, one per port, e.g. 0.0.0.0:7000-7007")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the menu search and its Monte Carlo random streams (reproducible runs)")
+    parser.add_argument("--engine", choices=sorted(SIMULATION_ENGINES), default=None,
+                        help=f"evaluation engine ({TOP3_ENGINE})")
+    parser.add_argument("--racing", action="store_true", default=None,
+                        help="race Monte Carlo candidates (implies --strategy random)")
+    parser.add_argument("--strategy", choices=sorted(SEARCH_STRATEGIES), default=None,
+                        help=f"search strategy ({TOP3_STRATEGY})")
+    parser.add_argument("--budget-sims", type=positive_int, default=None,
+                        help="simulation budget of the search and refinement")
+    parser.add_argument("--budget-seconds", type=float, default=None,
+                        help="wall-clock budget of the search and refinement")
+    parser.add_argument("--precision", type=float, default=None,
+                        help="re-evaluate the final menus until their income CI half-width is at most this")
+    parser.add_argument("--sweep", nargs="?", const=",".join(f"{f:g}" for f in SWEEP_FACTORS), default=None,
+                        metavar="FACTORS", help="what-if sweep of the found menus with each parameter multiplied by "
+                                                "these comma-separated factors (default: %(const)s)")
+    parser.add_argument("--profile", action="store_true", help="add a per-phase time profile to each record")
+    parser.add_argument("--cprofile", default=TOP3_CPROFILE, help="dump cProfile stats of each run to this file")
+    parser.add_argument("--resume", action="store_true",
+                        help="resume interrupted runs from the checkpoint next to each menu file "
+                             f"(*{CHECKPOINT_SUFFIX})")
+    parser.add_argument("--output", default="-", help="JSONL output file (default: stdout)")
+    return parser
+
+
+def run_headless(args):
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    pool = make_pool(args.workers, args.remote)
+    failed = False
+    try:
+        for path in args.menus:
+            start_time = time.time()
+            try:
+                menu = load_menu_file(path)
+                if args.seed is not None:
+                    random.seed(args.seed)
+                strategy = make_strategy(args.strategy, args.iterations, args.racing)
+                profile = RunProfile(args.cprofile)
+                options = dict(iterations=args.iterations, sims_per_eval=args.sims, max_ing_per_cat=args.max_ing,
+                               refine_steps=args.refine_steps, workers=args.workers, engine=args.engine,
+                               racing=args.racing, pool=pool, strategy=strategy, budget_sims=args.budget_sims,
+                               budget_seconds=args.budget_seconds, profile=profile, final_precision=args.precision,
+                               checkpoint=checkpoint_path(path), k=args.top)
+                # Without a usable checkpoint the run starts from scratch and overwrites it
+                checkpoint_note = "resumed" if args.resume and os.path.exists(checkpoint_path(path)) else None
+                try:
+                    top3_menus = compute_top3_menus(menu, resume=args.resume, **options)
+                except CheckpointRejected as e:
+                    checkpoint_note = f"rejected: {e}"
+                    top3_menus = compute_top3_menus(menu, **options)
+                record = menu_result_record(path, top3_menus, time.time() - start_time)
+                if checkpoint_note is not None:
+                    record["checkpoint"] = checkpoint_note
+                if args.sweep:
+                    factors = [float(factor) for factor in args.sweep.split(",")]
+                    record["sweep"] = sweep_menus(menu, top3_menus, sweep_variants(menu, top3_menus, factors),
+                                                  args.sims, args.engine, pool)
+                if args.profile:
+                    record["profile"] = profile.report()
+                if getattr(strategy, "info", None) is not None:
+                    record["search"] = strategy.info
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                record = {"menu": path, "error": f"{type(e).__name__}: {e}"}
+                failed = True
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        pool.shutdown()
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    # Headless entry point: runs the Top 3 search on the menu files given on the command line
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.serve:
+        serve_workers(args.serve)
+        return 0
+    if not args.menus:
+        parser.error("no menu files given")
+    return run_headless(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
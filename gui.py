@@ -0,0 +1,556 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import json
+import os
+import threading
+import time
+
+from burger_core import (
+    TOP3_CACHE_DIR,
+    TOP3_CPROFILE,
+    TOP3_K,
+    CheckpointRejected,
+    EvaluationCache,
+    IngredientStore,
+    RunProfile,
+    checkpoint_path,
+    compute_top3_ingredients,
+    compute_top3_menus,
+    load_menu_file,
+    make_pool,
+    make_warm_start,
+    significant_gaps,
+)
+
+# -----------------------------------------------------------
+# CONFIG
+# -----------------------------------------------------------
+
+# Search and engine settings live in burger_core.py
+
+DEFAULT_BOTTOM_BUN_PRICE = 5.0
+DEFAULT_BOTTOM_BUN_BONUS = 0.0
+DEFAULT_TOP_BUN_PRICE = 5.0
+DEFAULT_TOP_BUN_BONUS = 0.0
+
+LAST_MENU_STATE_FILE = "last_menu_path.json"
+
+TABLE_FILL_CHUNK = 200  # Ingredient table rows inserted per event loop turn, so large categories never freeze the UI
+TABLE_FILTER_DELAY = 150  # Milliseconds of no typing before the ingredient filter is applied
+
+# Sort key of each ingredient table column
+TABLE_SORT_KEYS = {
+    "name": lambda ing: ing["name"],
+    "price": lambda ing: ing["price"],
+    "bonus": lambda ing: ing["unique_bonus"],
+    "chance": lambda ing: ing["finish_chance"],
+    "enabled": lambda ing: "Yes" if ing.get("enabled", True) else "No",
+}
+
+
+class BurgerApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Burger Profit Optimizer Extended")
+        self.store = IngredientStore()
+        self.use_all_cores = tk.BooleanVar(value=True)
+        self.last_menu_path = None
+        self.loading_window = None
+        self.pool = None
+        self.cache = EvaluationCache(directory=TOP3_CACHE_DIR)
+        # Menu and best menus (as ingredient names) of the last Top 3 run, for warm starts after edits
+        self.last_top3_menu = None
+        self.last_top3 = None
+        self.last_profile = None
+        self.resume_top3 = False
+        # What the ingredient table shows: the category, its filtered and sorted ingredients, how many of them
+        # have rows yet and the ingredient of every row
+        self.table_cat = None
+        self.table_view = []
+        self.table_filled = 0
+        self.table_rows = {}
+        self.table_sort = ("name", False)
+        self.table_fill_job = None
+        self.filter_job = None
+        self.build_gui()
+        self.load_last_menu_if_exists()
+
+    def build_gui(self):
+        frame = ttk.Frame(self.root)
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.root.rowconfigure(0, weight=1)
+        self.root.columnconfigure(0, weight=1)
+        for col in range(5):
+            frame.columnconfigure(col, weight=1)
+        for row in (1, 4):
+            frame.rowconfigure(row, weight=1)
+
+        ttk.Label(frame, text="Category:").grid(row=0, column=1)
+        self.cat_name = tk.Entry(frame)
+        self.cat_name.grid(row=0, column=2)
+        ttk.Button(frame, text="Add Category", command=self.add_category).grid(row=0, column=3)
+
+        self.cat_list = tk.Listbox(frame, width=35, height=6, exportselection=False)
+        self.cat_list.grid(row=1, column=0, columnspan=5, pady=10, sticky="nsew")
+        self.cat_list.bind("<<ListboxSelect>>", self.update_ingredient_table)
+
+        ttk.Label(frame, text="Name").grid(row=2, column=0)
+        ttk.Label(frame, text="Price").grid(row=2, column=1)
+        ttk.Label(frame, text="Unique Bonus").grid(row=2, column=2)
+        ttk.Label(frame, text="Finish Chance").grid(row=2, column=3)
+
+        filter_frame = ttk.Frame(frame)
+        filter_frame.grid(row=2, column=4)
+        ttk.Label(filter_frame, text="Filter:").pack(side="left")
+        self.table_filter = tk.StringVar()
+        tk.Entry(filter_frame, textvariable=self.table_filter, width=12).pack(side="left")
+        self.table_filter.trace_add("write", self.schedule_filter)
+
+        self.ing_name = tk.Entry(frame)
+        self.ing_price = tk.Entry(frame)
+        self.ing_bonus = tk.Entry(frame)
+        self.ing_finish = tk.Entry(frame)
+
+        self.ing_name.grid(row=3, column=0)
+        self.ing_price.grid(row=3, column=1)
+        self.ing_bonus.grid(row=3, column=2)
+        self.ing_finish.grid(row=3, column=3)
+
+        ttk.Button(frame, text="Add Ingredient", command=self.add_ingredient).grid(row=3, column=4)
+
+        self.table = ttk.Treeview(frame, columns=("name", "price", "bonus", "chance", "enabled"), show="headings",
+                                  height=7)
+        self.table.grid(row=4, column=0, columnspan=5, pady=10, sticky="nsew")
+        self.table.heading("name", text="Name", command=lambda: self.sort_table("name", False))
+        self.table.heading("price", text="Price", command=lambda: self.sort_table("price", False))
+        self.table.heading("bonus", text="Unique Bonus", command=lambda: self.sort_table("bonus", False))
+        self.table.heading("chance", text="Finish Chance", command=lambda: self.sort_table("chance", False))
+        self.table.heading("enabled", text="In Top 3", command=lambda: self.sort_table("enabled", False))
+        self.table.bind("<Double-1>", self.edit_cell)
+
+        ttk.Label(frame, text="Bottom Bun Price:").grid(row=5, column=1)
+        self.bottom_price = tk.Entry(frame)
+        self.bottom_price.insert(0, str(DEFAULT_BOTTOM_BUN_PRICE))
+        self.bottom_price.grid(row=5, column=2)
+
+        ttk.Label(frame, text="Uniqueness Bonus:").grid(row=5, column=3)
+        self.bottom_bonus = tk.Entry(frame)
+        self.bottom_bonus.insert(0, str(DEFAULT_BOTTOM_BUN_BONUS))
+        self.bottom_bonus.grid(row=5, column=4)
+
+        ttk.Label(frame, text="Top Bun Price:").grid(row=6, column=1)
+        self.top_price = tk.Entry(frame)
+        self.top_price.insert(0, str(DEFAULT_TOP_BUN_PRICE))
+        self.top_price.grid(row=6, column=2)
+
+        ttk.Label(frame, text="Uniqueness Bonus:").grid(row=6, column=3)
+        self.top_bonus = tk.Entry(frame)
+        self.top_bonus.insert(0, str(DEFAULT_TOP_BUN_BONUS))
+        self.top_bonus.grid(row=6, column=4)
+
+        ttk.Button(frame, text="Save Menu", command=self.save_menu).grid(row=7, column=1)
+        ttk.Button(frame, text="Load Menu", command=self.load_menu).grid(row=7, column=2)
+        self.top3_button = ttk.Button(frame, text="Top 3", command=self.show_top3)
+        self.top3_button.grid(row=7, column=3)
+        tk.Checkbutton(frame, text="Use all cores", variable=self.use_all_cores).grid(row=7, column=4, sticky="w")
+        ttk.Button(frame, text="Export Profile", command=self.export_profile).grid(row=7, column=0)
+
+    def add_category(self):
+        name = self.cat_name.get().strip()
+        if name and self.store.add_category(name):
+            self.cat_list.insert(tk.END, name)
+        self.cat_name.delete(0, tk.END)
+
+    def add_ingredient(self):
+        try:
+            cat = self.cat_list.get(self.cat_list.curselection())
+        except:
+            messagebox.showerror("Error", "Select a category")
+            return
+
+        try:
+            ing = {
+                "name": self.ing_name.get(),
+                "price": float(self.ing_price.get()),
+                "finish_chance": float(self.ing_finish.get()),
+                "unique_bonus": float(self.ing_bonus.get()),
+                "enabled": True,
+            }
+        except:
+            messagebox.showerror("Error", "Check ingredient data")
+            return
+
+        try:
+            self.store.add(cat, ing)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.ing_name.delete(0, tk.END)
+        self.ing_price.delete(0, tk.END)
+        self.ing_finish.delete(0, tk.END)
+        self.ing_bonus.delete(0, tk.END)
+        if cat == self.table_cat:
+            self.insert_table_row(ing)
+        else:
+            self.update_ingredient_table()
+
+    def update_ingredient_table(self, event=None):
+        try:
+            cat = self.cat_list.get(self.cat_list.curselection())
+        except:
+            cat = None
+        self.show_category(cat)
+
+    def show_category(self, cat):
+        # Rebuilds the table for a category (or clears it); rows are filled in chunks from the event loop
+        if self.table_fill_job is not None:
+            self.root.after_cancel(self.table_fill_job)
+            self.table_fill_job = None
+        rows = self.table.get_children()
+        if rows:
+            self.table.delete(*rows)
+        self.table_rows = {}
+        self.table_filled = 0
+        self.table_cat = cat
+        self.table_view = []
+        if cat is None:
+            return
+        self.table_view = self.store.find(cat, self.table_filter.get())
+        col, reverse = self.table_sort
+        if col != "name" or reverse:
+            self.table_view.sort(key=TABLE_SORT_KEYS[col], reverse=reverse)
+        self.fill_table()
+
+    def fill_table(self):
+        self.table_fill_job = None
+        end = min(self.table_filled + TABLE_FILL_CHUNK, len(self.table_view))
+        for ing in self.table_view[self.table_filled:end]:
+            self.table_rows[self.table.insert("", "end", values=self.row_values(ing))] = ing
+        self.table_filled = end
+        if end < len(self.table_view):
+            self.table_fill_job = self.root.after(1, self.fill_table)
+
+    def row_values(self, ing):
+        return (ing["name"], ing["price"], ing["unique_bonus"], ing["finish_chance"],
+                "Yes" if ing.get("enabled", True) else "No")
+
+    def insert_table_row(self, ing):
+        # Adds one ingredient where the current filter and order put it, without rebuilding the table
+        text = self.table_filter.get().strip().lower()
+        if text and text not in ing["name"].lower():
+            return
+        col, reverse = self.table_sort
+        key = TABLE_SORT_KEYS[col]
+        position = next((i for i, other in enumerate(self.table_view)
+                         if (key(other) < key(ing) if reverse else key(other) > key(ing))), len(self.table_view))
+        self.table_view.insert(position, ing)
+        # Rows past the filled part are picked up by the pending fill
+        if self.table_fill_job is None or position < self.table_filled:
+            self.table_rows[self.table.insert("", position, values=self.row_values(ing))] = ing
+            self.table_filled += 1
+
+    def schedule_filter(self, *args):
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(TABLE_FILTER_DELAY, self.apply_filter)
+
+    def apply_filter(self):
+        self.filter_job = None
+        self.show_category(self.table_cat)
+
+    def sort_table(self, col, reverse):
+        self.table_sort = (col, reverse)
+        self.show_category(self.table_cat)
+        self.table.heading(col, command=lambda: self.sort_table(col, not reverse))
+
+    def edit_cell(self, event):
+        selection = self.table.selection()
+        if not selection:
+            return
+        item = selection[0]
+        ing = self.table_rows.get(item)
+        if ing is None:
+            return
+        name = ing["name"]
+        edit_win = tk.Toplevel(self.root)
+        edit_win.title(name)
+
+        tk.Label(edit_win, text="Price").grid(row=0, column=0)
+        e1 = tk.Entry(edit_win);
+        e1.insert(0, str(ing["price"]));
+        e1.grid(row=0, column=1)
+        tk.Label(edit_win, text="Chance").grid(row=1, column=0)
+        e2 = tk.Entry(edit_win);
+        e2.insert(0, str(ing["finish_chance"]));
+        e2.grid(row=1, column=1)
+        tk.Label(edit_win, text="Bonus").grid(row=2, column=0)
+        e3 = tk.Entry(edit_win);
+        e3.insert(0, str(ing["unique_bonus"]));
+        e3.grid(row=2, column=1)
+        var_enabled = tk.BooleanVar(value=ing.get("enabled", True))
+        tk.Checkbutton(edit_win, text="Use in Top 3", variable=var_enabled).grid(row=3, column=0, columnspan=2)
+
+        def save():
+            # The row's own dict: loaded menus can hold the same name twice, and a lookup by name would edit the
+            # first of them
+            ing.update(price=float(e1.get()), finish_chance=float(e2.get()), unique_bonus=float(e3.get()),
+                       enabled=bool(var_enabled.get()))
+            edit_win.destroy()
+            # Only the edited row changes; the table is re-sorted when a column heading is clicked again
+            if self.table.exists(item):
+                self.table.item(item, values=self.row_values(ing))
+
+        tk.Button(edit_win, text="OK", command=save).grid(row=4, column=0, columnspan=2)
+
+    def save_menu(self):
+        data = {
+            "bottom_bun": {"price": float(self.bottom_price.get()), "unique_bonus": float(self.bottom_bonus.get())},
+            "top_bun": {"price": float(self.top_price.get()), "unique_bonus": float(self.top_bonus.get())},
+            "categories": self.store.categories
+        }
+        path = filedialog.asksaveasfilename(defaultextension=".json")
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+            self.last_menu_path = path
+            self.save_last_menu_path()
+
+    def load_menu(self):
+        path = filedialog.askopenfilename(filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        self.load_menu_from_path(path)
+        self.last_menu_path = path
+        self.save_last_menu_path()
+
+    def load_menu_from_path(self, path):
+        data = load_menu_file(path)
+
+        self.bottom_price.delete(0, tk.END)
+        self.bottom_price.insert(0, data["bottom_bun"]["price"])
+        self.bottom_bonus.delete(0, tk.END)
+        self.bottom_bonus.insert(0, data["bottom_bun"]["unique_bonus"])
+
+        self.top_price.delete(0, tk.END)
+        self.top_price.insert(0, data["top_bun"]["price"])
+        self.top_bonus.delete(0, tk.END)
+        self.top_bonus.insert(0, data["top_bun"]["unique_bonus"])
+
+        self.store.load(data["categories"])
+
+        self.cat_list.delete(0, tk.END)
+        for cat in self.store.categories:
+            self.cat_list.insert(tk.END, cat)
+
+        if self.cat_list.size() > 0:
+            self.cat_list.selection_clear(0, tk.END)
+            self.cat_list.selection_set(0)
+            try:
+                self.cat_list.activate(0)
+            except Exception:
+                pass
+            self.update_ingredient_table()
+
+    def save_last_menu_path(self):
+        if not self.last_menu_path:
+            return
+        try:
+            with open(LAST_MENU_STATE_FILE, "w", encoding="utf-8") as f:
+                json.dump({"last_path": self.last_menu_path}, f)
+        except Exception:
+            pass
+
+    def load_last_menu_if_exists(self):
+        try:
+            if os.path.exists(LAST_MENU_STATE_FILE):
+                with open(LAST_MENU_STATE_FILE, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                path = data.get("last_path")
+                if path and os.path.exists(path):
+                    self.last_menu_path = path
+                    self.load_menu_from_path(path)
+        except Exception:
+            pass
+
+    def show_top3(self):
+        if self.loading_window is not None:
+            return
+
+        self.resume_top3 = os.path.exists(checkpoint_path(self.last_menu_path)) and messagebox.askyesno(
+            "Resume Top 3", "An unfinished Top 3 run was found. Resume it instead of starting over?")
+
+        self.loading_window = tk.Toplevel(self.root)
+        self.loading_window.title("Calculating Top 3")
+        self.loading_window.transient(self.root)
+        self.loading_window.grab_set()
+        self.progress_label = ttk.Label(self.loading_window, text="Calculating Top 3, please wait...")
+        self.progress_label.pack(padx=20, pady=10)
+        self.progress_bar = ttk.Progressbar(self.loading_window, mode="determinate", maximum=100)
+        self.progress_bar.pack(fill="x", padx=20, pady=(0, 10))
+        self.leaderboard = tk.Listbox(self.loading_window, width=90, height=min(TOP3_K, 10))
+        self.leaderboard.pack(fill="both", expand=True, padx=20, pady=(0, 10))
+        self.cancel_button = ttk.Button(self.loading_window, text="Cancel", command=self.cancel_top3)
+        self.cancel_button.pack(pady=(0, 10))
+        self.loading_window.protocol("WM_DELETE_WINDOW", self.cancel_top3)
+        self.cancel_event = threading.Event()
+        self.last_progress_time = 0.0
+
+        self.loading_window.update_idletasks()
+        root_x = self.root.winfo_x()
+        root_y = self.root.winfo_y()
+        root_w = self.root.winfo_width()
+        root_h = self.root.winfo_height()
+        win_w = self.loading_window.winfo_width()
+        win_h = self.loading_window.winfo_height()
+        x = root_x + (root_w - win_w) // 2
+        y = root_y + (root_h - win_h) // 2
+        self.loading_window.geometry(f"{win_w}x{win_h}+{x}+{y}")
+
+        self.top3_button.config(state="disabled")
+
+        thread = threading.Thread(target=self._compute_top3_async, daemon=True)
+        thread.start()
+
+    def _compute_top3_async(self):
+        try:
+            self._compute_top3()
+        except Exception as e:
+            # Broken pool processes or unreachable remote workers: start the next run with a fresh pool
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+            self.root.after(0, self._show_top3_error, e)
+
+    def _compute_top3(self):
+        menu = {
+            "bottom_bun": {"price": float(self.bottom_price.get()), "unique_bonus": float(self.bottom_bonus.get())},
+            "top_bun": {"price": float(self.top_price.get()), "unique_bonus": float(self.top_bonus.get())},
+            "categories": self.store.categories,
+        }
+
+        workers = None if self.use_all_cores.get() else 1
+        pool = None
+        if workers is None:
+            if self.pool is None:
+                self.pool = make_pool()
+            pool = self.pool
+
+        def progress(info):
+            # Throttle redraws; phase ends are always shown
+            now = time.time()
+            if now - self.last_progress_time >= 0.1 or info["done"] >= info["total"]:
+                self.last_progress_time = now
+                self.root.after(0, self._update_top3_progress, info)
+
+        # Copy the menu, the ingredient dicts keep changing while the app is edited
+        menu = json.loads(json.dumps(menu))
+        strategy = make_warm_start(self.last_top3_menu, self.last_top3, menu)
+
+        start_time = time.time()
+        profile = RunProfile(TOP3_CPROFILE)
+        checkpoint = checkpoint_path(self.last_menu_path)
+        checkpoint_note = "Resumed the unfinished run" if self.resume_top3 else None
+        try:
+            top3_menus = compute_top3_menus(menu, workers=workers, pool=pool, cache=self.cache, progress=progress,
+                                            cancel=self.cancel_event, strategy=strategy, profile=profile,
+                                            checkpoint=checkpoint, resume=self.resume_top3)
+        except CheckpointRejected as e:
+            checkpoint_note = f"Started over, the unfinished run could not be resumed: {e}"
+            top3_menus = compute_top3_menus(menu, workers=workers, pool=pool, cache=self.cache, progress=progress,
+                                            cancel=self.cancel_event, strategy=strategy, profile=profile,
+                                            checkpoint=checkpoint)
+        top3_ingredients = compute_top3_ingredients(menu)
+        self.last_profile = profile
+        if top3_menus:
+            self.last_top3_menu = menu
+            self.last_top3 = [{cat: [ing["name"] for ing in ings] for cat, ings in categories_dict.items()}
+                              for _, categories_dict, _ in top3_menus]
+        elapsed = time.time() - start_time
+
+        self.root.after(0, self._show_top3_result, top3_menus, top3_ingredients, elapsed,
+                        self.cancel_event.is_set(), strategy is not None, profile.summary(), checkpoint_note)
+
+    def _update_top3_progress(self, info):
+        if self.loading_window is None or self.cancel_event.is_set():
+            return
+        phase = info["phase"].capitalize()
+        self.progress_label.config(
+            text=f"{phase}: {info['done']}/{info['total']} ({info['evaluated']} menus evaluated)")
+        self.progress_bar["value"] = 100.0 * info["done"] / max(info["total"], 1)
+        self.leaderboard.delete(0, tk.END)
+        for i, (income, categories_dict, ci) in enumerate(info["best"], start=1):
+            cats = "; ".join(f"{cat}: {', '.join(ing['name'] for ing in ings) or '-'}"
+                             for cat, ings in categories_dict.items())
+            self.leaderboard.insert(tk.END, f"#{i} {income:.2f} ± {ci:.2f}  {cats}")
+
+    def cancel_top3(self):
+        if self.loading_window is None:
+            return
+        self.cancel_event.set()
+        self.cancel_button.config(state="disabled")
+        self.progress_label.config(text="Cancelling, keeping the best menus found so far...")
+
+    def _close_top3_window(self):
+        if self.loading_window is not None:
+            try:
+                self.loading_window.destroy()
+            except Exception:
+                pass
+            self.loading_window = None
+
+        self.top3_button.config(state="normal")
+
+    def _show_top3_error(self, error):
+        self._close_top3_window()
+        messagebox.showerror("Top 3", f"Top 3 failed: {type(error).__name__}: {error}")
+
+    def _show_top3_result(self, top3_menus, top3_ingredients, elapsed, cancelled=False, warm_start=False,
+                          profile=None, checkpoint_note=None):
+        self._close_top3_window()
+
+        lines = []
+        lines.append(f"Calculation Time: {elapsed:.2f} s")
+        if cancelled:
+            lines.append("Cancelled: showing the best menus found so far (Top 3 can resume this run)")
+        if checkpoint_note:
+            lines.append(checkpoint_note)
+        if warm_start:
+            lines.append("Re-optimized from the previous Top 3 after your edits")
+        lines.append("")
+        lines.append(f"Top {len(top3_menus)} Menus:")
+        significant = significant_gaps(top3_menus)
+        for i, (income, categories_dict, ci) in enumerate(top3_menus, start=1):
+            block_lines = [f"Menu #{i}: Income {round(income, 2)} ± {round(ci, 2)}"]
+            if significant[i - 1] is False:
+                block_lines[0] += f" (not significantly above #{i + 1})"
+            for cat, ings in categories_dict.items():
+                if not ings:
+                    block_lines.append(f"  {cat}: <empty>")
+                else:
+                    ing_list = []
+                    for ing in ings:
+                        ing_list.append(
+                            f"{ing['name']} (Price {ing['price']}, Chance {ing['finish_chance']}, Bonus {ing['unique_bonus']})")
+                    block_lines.append(f"  {cat}: {', '.join(ing_list)}")
+            lines.append("\n".join(block_lines))
+
+        if profile:
+            lines.append(profile)
+        lines.append("")
+
+        messagebox.showinfo("Top 3", "\n\n".join(lines))
+
+    def export_profile(self):
+        if self.last_profile is None:
+            messagebox.showerror("Error", "Run Top 3 first")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".json", initialfile="top3_profile.json")
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.last_profile.report(), f, indent=4)
+
+    def on_close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        self.root.destroy()
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from multiprocessing.connection import Client
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import burger_core as core
+
+MENU_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_menu.json")
+SEARCH = dict(iterations=120, sims_per_eval=400, engine="python", refine_steps=3, seed=7)
+WORKERS = 3
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_worker(address, authkey, timeout=10.0):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            Client(address, authkey=authkey).close()
+            return
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+@pytest.fixture
+def workers():
+    authkey = os.urandom(16)
+    addresses = [("127.0.0.1", free_port()) for _ in range(WORKERS)]
+    processes = [multiprocessing.Process(target=core.serve_worker, args=(address, authkey), daemon=True)
+                 for address in addresses]
+    for process in processes:
+        process.start()
+    for address in addresses:
+        wait_for_worker(address, authkey)
+    yield [f"{host}:{port}" for host, port in addresses], authkey, processes
+    for process in processes:
+        process.kill()
+        process.join()
+
+
+@pytest.fixture
+def menu():
+    return core.load_menu_file(MENU_FILE)
+
+
+def top_menus(menu, pool, **kwargs):
+    try:
+        return core.compute_top3_menus(menu, pool=pool, **dict(SEARCH, **kwargs))
+    finally:
+        pool.shutdown()
+
+
+def test_distributed_matches_local_pool(workers, menu):
+    addresses, authkey, _ = workers
+    remote = top_menus(menu, core.DistributedPool(addresses, authkey))
+    assert remote == top_menus(menu, core.EvaluationPool(WORKERS))
+
+
+def test_distributed_survives_killed_worker(workers, menu, monkeypatch):
+    addresses, authkey, processes = workers
+    monkeypatch.setattr(core, "DISTRIBUTED_RETRY_DELAY", 0.05)
+    monkeypatch.setattr(core, "DISTRIBUTED_RETRIES", 1)
+    victim = processes[1]
+
+    def kill_once(info):
+        if victim.is_alive():
+            victim.kill()
+            victim.join()
+
+    remote = top_menus(menu, core.DistributedPool(addresses, authkey), progress=kill_once)
+    assert not victim.is_alive()
+    assert remote == top_menus(menu, core.EvaluationPool(WORKERS))
+
+
+def test_distributed_needs_authkey(monkeypatch):
+    monkeypatch.setattr(core, "DISTRIBUTED_AUTHKEY", None)
+    monkeypatch.delenv("BURGER_AUTHKEY", raising=False)
+    with pytest.raises(ValueError):
+        core.serve_worker(("127.0.0.1", free_port()))
@@ -0,0 +1,47 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import burger_core as core
+
+MENU_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_menu.json")
+SIMS = 20000
+
+
+def sample_configs(compiled, count, max_ing_per_cat):
+    rng = random.Random(5)
+    configs = [None]
+    for _ in range(count):
+        config = []
+        for ci in range(len(compiled.categories)):
+            slots = compiled.enabled_slots(ci)
+            if slots:
+                config.extend(rng.sample(slots, rng.randint(1, min(len(slots), max_ing_per_cat))))
+        configs.append(tuple(sorted(config)))
+    return configs
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    return core.CompiledMenu(core.load_menu_file(MENU_FILE))
+
+
+def test_exact_engine_solves_the_test_menu(compiled):
+    # The full menu and large configs stay within EXACT_MAX_STATES, so none of them may fall back
+    for config in sample_configs(compiled, 30, 10):
+        core.expected_income_compiled(compiled, config)
+
+
+@pytest.mark.parametrize("index", range(6))
+def test_exact_matches_monte_carlo(compiled, index):
+    config = sample_configs(compiled, 5, 3)[index]
+    exact = core.simulate_config_stats(compiled, config, SIMS, "exact")
+    assert core.stats_ci(exact) == 0.0
+    sampled = core.simulate_config_stats(compiled, config, SIMS, "python", seed=11)
+    # A few interval half-widths of slack keep the test from flaking on an unlucky stream
+    tolerance = 4 * core.stats_ci(sampled)
+    assert abs(core.stats_mean(exact) - core.stats_mean(sampled)) <= tolerance